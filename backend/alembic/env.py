@@ -19,7 +19,8 @@ from app.database import DATABASE_URL
 config = context.config
 
 # Override sqlalchemy.url with our DATABASE_URL
-config.set_main_option("sqlalchemy.url", DATABASE_URL)
+# (escape '%' vì Config dùng ConfigParser interpolation)
+config.set_main_option("sqlalchemy.url", DATABASE_URL.replace("%", "%%"))
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
@@ -68,7 +69,7 @@ def run_migrations_online() -> None:
 
     """
     connectable = engine_from_config(
-        config.get_section(config.config_file_name),
+        config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
         poolclass=pool.NullPool,
     )
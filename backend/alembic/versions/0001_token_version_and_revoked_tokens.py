@@ -0,0 +1,44 @@
+"""token_version column and RevokedTokens table
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-17 09:00:00
+
+Đưa các thay đổi schema của JWT claims (Users.token_version) và refresh
+token (RevokedTokens) vào migration. Database tạo từ database.sql có thể
+đã được thêm tay theo README nên bước nào đã có thì bỏ qua.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    user_columns = {column["name"] for column in inspector.get_columns("Users")}
+    if "token_version" not in user_columns:
+        op.add_column(
+            "Users",
+            sa.Column("token_version", sa.Integer(), nullable=False, server_default="0"),
+        )
+
+    if not inspector.has_table("RevokedTokens"):
+        op.create_table(
+            "RevokedTokens",
+            sa.Column("jti", sa.String(64), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("Users.user_id", ondelete="CASCADE"), nullable=False),
+            sa.Column("expires_at", sa.DateTime(), nullable=False),
+            sa.Column("revoked_at", sa.DateTime()),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("RevokedTokens")
+    op.drop_column("Users", "token_version")
@@ -0,0 +1,42 @@
+"""indexes for hot queries
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 09:30:00
+
+Index ghép khớp với các truy vấn thường gặp:
+- ChatLogs / SearchHistory lọc theo user_id, sắp xếp theo thời gian
+- AdminVocabActions / AdminUserActions sắp xếp theo action_time (có lọc action_type)
+- Vocabulary lọc theo level / topic / part_of_speech, phân trang theo word_id
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ("ix_chatlogs_user_id_chat_time", "ChatLogs", ["user_id", "chat_time"]),
+    ("ix_searchhistory_user_id_searched_at", "SearchHistory", ["user_id", "searched_at"]),
+    ("ix_adminvocabactions_action_time", "AdminVocabActions", ["action_time"]),
+    ("ix_adminvocabactions_type_time", "AdminVocabActions", ["action_type", "action_time"]),
+    ("ix_adminuseractions_action_time", "AdminUserActions", ["action_time"]),
+    ("ix_vocabulary_level_word_id", "Vocabulary", ["level", "word_id"]),
+    ("ix_vocabulary_topic_word_id", "Vocabulary", ["topic", "word_id"]),
+    ("ix_vocabulary_pos_word_id", "Vocabulary", ["part_of_speech", "word_id"]),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,41 @@
+"""UserStats table
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 11:00:00
+
+Bảng bộ đếm học tập theo user (số từ đã học, số từ trong chu kỳ, số từ đã
+học theo level). Không cần backfill: dòng còn thiếu được tính từ
+UserVocabulary/CycleVocabulary khi đọc và được tạo ở lần ghi đầu tiên.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+COUNTERS = [
+    "learned_count", "cycle_pending_count",
+    "learned_a1", "learned_a2", "learned_b1", "learned_b2", "learned_c1", "learned_c2",
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table("UserStats"):
+        return
+    op.create_table(
+        "UserStats",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("Users.user_id", ondelete="CASCADE"), primary_key=True),
+        *(sa.Column(name, sa.Integer(), nullable=False, server_default="0") for name in COUNTERS),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("UserStats")
@@ -0,0 +1,47 @@
+"""commit-ordered catalog version
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 13:00:00
+
+Phiên bản catalog chuyển từ max(action_id) sang bảng CatalogVersion một dòng,
+tăng cùng transaction với thao tác admin nên theo đúng thứ tự commit. Backfill
+catalog_version = action_id và khởi tạo bộ đếm bằng max(action_id), để các
+phiên bản client đang giữ (ETag, `since` của /vocabulary/changes) vẫn đúng.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    columns = {column["name"] for column in inspector.get_columns("AdminVocabActions")}
+    if "catalog_version" not in columns:
+        op.add_column("AdminVocabActions", sa.Column("catalog_version", sa.Integer(), nullable=True))
+        op.create_index("ix_adminvocabactions_catalog_version", "AdminVocabActions", ["catalog_version"])
+    op.execute("UPDATE AdminVocabActions SET catalog_version = action_id WHERE catalog_version IS NULL")
+
+    if not inspector.has_table("CatalogVersion"):
+        op.create_table(
+            "CatalogVersion",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("version", sa.Integer(), nullable=False, server_default="0"),
+        )
+    op.execute(
+        "INSERT INTO CatalogVersion (id, version) "
+        "SELECT 1, COALESCE(MAX(action_id), 0) FROM AdminVocabActions "
+        "WHERE NOT EXISTS (SELECT 1 FROM CatalogVersion WHERE id = 1)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("CatalogVersion")
+    op.drop_index("ix_adminvocabactions_catalog_version", table_name="AdminVocabActions")
+    op.drop_column("AdminVocabActions", "catalog_version")
@@ -0,0 +1,35 @@
+"""UsedQuizSessions table
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 14:00:00
+
+Phiên làm bài trắc nghiệm chỉ được nộp một lần: mỗi lần nộp ghi session_id
+vào bảng này, khóa chính trùng nghĩa là phiên đã được nộp (kể cả ở worker khác).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("UsedQuizSessions"):
+        op.create_table(
+            "UsedQuizSessions",
+            sa.Column("session_id", sa.String(16), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("Users.user_id", ondelete="CASCADE"), nullable=False),
+            sa.Column("expires_at", sa.DateTime(), nullable=False),
+            sa.Column("used_at", sa.DateTime()),
+        )
+        op.create_index("ix_usedquizsessions_expires_at", "UsedQuizSessions", ["expires_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("UsedQuizSessions")
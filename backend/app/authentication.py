@@ -1,13 +1,20 @@
 #authentication.py
 from datetime import datetime, timedelta
+import uuid
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from .database import get_db
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
+from .database import get_async_db
 from . import models, schemas
+from .utils.user_cache import user_cache
+from .utils.password_pool import password_pool, PasswordPoolBusy
+from .utils.token_revocation import revocation_list
 import os
 from dotenv import load_dotenv
 
@@ -17,6 +24,10 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
+# Nhúng user_id và role vào JWT để get_current_principal dựng danh tính thẳng từ
+# claims; tắt đi thì token chỉ mang `sub` và `ver` (token_version luôn được nhúng)
+JWT_EMBED_CLAIMS = os.getenv("JWT_EMBED_CLAIMS", "true").lower() in ("1", "true", "yes")
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -38,6 +49,31 @@ def authenticate_user(db: Session, username: str, password: str):
         return False
     return user
 
+async def _run_in_password_pool(func, *args):
+    try:
+        return await password_pool.run(func, *args)
+    except PasswordPoolBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent password operations, please retry",
+            headers={"Retry-After": "1"},
+        )
+
+async def verify_password_async(plain_password, hashed_password):
+    return await _run_in_password_pool(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await _run_in_password_pool(get_password_hash, password)
+
+async def authenticate_user_async(db: AsyncSession, username: str, password: str):
+    result = await db.execute(select(models.User).where(models.User.username == username))
+    user = result.scalars().first()
+    if not user:
+        return False
+    if not await verify_password_async(password, user.password):
+        return False
+    return user
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -48,32 +84,201 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
+def create_user_access_token(user: models.User, expires_delta: Optional[timedelta] = None):
+    data = {"sub": user.username, "ver": user.token_version or 0}
+    if JWT_EMBED_CLAIMS:
+        data.update({
+            "uid": user.user_id,
+            "role": user.role,
+        })
+    return create_access_token(data=data, expires_delta=expires_delta)
+
+def create_refresh_token(user: models.User):
+    expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    to_encode = {
+        "sub": user.username,
+        "uid": user.user_id,
+        "ver": user.token_version or 0,
+        "type": "refresh",
+        "jti": uuid.uuid4().hex,
+        "exp": expire,
+    }
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+def create_token_pair(user: models.User):
+    access_token = create_user_access_token(
+        user, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
+    return {
+        "access_token": access_token,
+        "refresh_token": create_refresh_token(user),
+        "token_type": "bearer",
+    }
+
+def bump_token_version(user: models.User):
+    """Thu hồi mọi token đã cấp cho user (có hiệu lực sau khi commit)"""
+    user.token_version = (user.token_version or 0) + 1
+
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+def decode_access_token(token: str) -> schemas.TokenData:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        # Token không có `ver` thì không thu hồi được nên không chấp nhận
+        if username is None or payload.get("type") == "refresh" or payload.get("ver") is None:
             raise credentials_exception
-        token_data = schemas.TokenData(username=username)
+        return schemas.TokenData(
+            username=username,
+            user_id=payload.get("uid"),
+            role=payload.get("role"),
+            token_version=payload.get("ver"),
+        )
     except JWTError:
         raise credentials_exception
-    user = db.query(models.User).filter(models.User.username == token_data.username).first()
-    if user is None:
+
+async def _load_user_data(db: AsyncSession, token_data: schemas.TokenData) -> dict:
+    """Lấy snapshot cột của user theo `sub`, từ cache hoặc DB, và kiểm tra token_version"""
+    data = user_cache.get(token_data.username)
+    if data is None:
+        result = await db.execute(select(models.User).where(models.User.username == token_data.username))
+        user = result.scalars().first()
+        if user is None:
+            raise credentials_exception
+        data = _snapshot_user(user)
+        user_cache.set(token_data.username, data)
+    if token_data.token_version != (data["token_version"] or 0):
+        raise credentials_exception
+    return data
+
+def _decode_refresh_token(refresh_token: str) -> dict:
+    try:
+        payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
         raise credentials_exception
+    if payload.get("type") != "refresh" or not payload.get("sub") or not payload.get("jti"):
+        raise credentials_exception
+    return payload
+
+async def _revoke_jti(db: AsyncSession, payload: dict) -> bool:
+    """
+    Ghi JTI vào RevokedTokens; trả về False nếu JTI đã bị thu hồi từ trước.
+
+    Khóa chính `jti` trong DB là nguồn sự thật duy nhất giữa các worker và giữa
+    các request đồng thời: chỉ một INSERT thành công, các lần sau gặp
+    IntegrityError. Tập trong bộ nhớ chỉ để từ chối nhanh.
+    """
+    db.add(models.RevokedToken(
+        jti=payload["jti"],
+        user_id=payload.get("uid"),
+        expires_at=datetime.utcfromtimestamp(payload["exp"])
+    ))
+    try:
+        await db.commit()
+        revoked = True
+    except IntegrityError:
+        await db.rollback()
+        revoked = False
+    revocation_list.revoke(payload["jti"], payload["exp"])
+    return revoked
+
+async def refresh_tokens(db: AsyncSession, refresh_token: str):
+    """
+    Đổi refresh token lấy cặp token mới, không băm mật khẩu.
+
+    Refresh token cũ bị thu hồi ngay (rotation), nên mỗi token chỉ dùng được một lần.
+    """
+    payload = _decode_refresh_token(refresh_token)
+    if revocation_list.is_revoked(payload["jti"]):
+        raise credentials_exception
+    token_data = schemas.TokenData(
+        username=payload["sub"],
+        user_id=payload.get("uid"),
+        token_version=payload.get("ver"),
+    )
+    data = await _load_user_data(db, token_data)
+    if not await _revoke_jti(db, payload):
+        # Worker khác hoặc request đồng thời đã dùng token này
+        raise credentials_exception
+    user = models.User(**data)
+    return create_token_pair(user)
+
+async def revoke_refresh_token(db: AsyncSession, refresh_token: str):
+    payload = _decode_refresh_token(refresh_token)
+    if not revocation_list.is_revoked(payload["jti"]):
+        # Đã bị thu hồi ở worker khác thì coi như đăng xuất xong
+        await _revoke_jti(db, payload)
+
+def load_revoked_tokens(db: Session):
+    """Xóa các JTI đã hết hạn và nạp phần còn lại vào bộ nhớ (gọi khi khởi động)"""
+    now = datetime.utcnow()
+    db.query(models.RevokedToken).filter(models.RevokedToken.expires_at <= now).delete()
+    db.commit()
+    rows = db.query(models.RevokedToken.jti, models.RevokedToken.expires_at).all()
+    revocation_list.load(
+        (jti, (expires_at - datetime(1970, 1, 1)).total_seconds()) for jti, expires_at in rows
+    )
+
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """
+    Trả về User ở trạng thái detached (không gắn session nào).
+
+    Route nào cần sửa user thì merge vào session của mình trước:
+    `user = db.merge(current_user, load=False)`.
+    """
+    token_data = decode_access_token(token)
+    data = await _load_user_data(db, token_data)
+    request.state.user_id = data["user_id"]
+    return _detached_user(data)
+
+async def get_current_principal(request: Request, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """
+    Danh tính nhẹ cho các route chỉ cần user_id/role.
+
+    Không gắn User vào session; khi cache user còn hạn thì không có query nào
+    (session chỉ mở kết nối khi thực sự được dùng).
+    """
+    token_data = decode_access_token(token)
+    data = await _load_user_data(db, token_data)
+    # Dùng cho read-your-writes khi định tuyến sang replica
+    request.state.user_id = data["user_id"]
+    if token_data.user_id is not None and token_data.role is not None:
+        # `ver` khớp nên claims còn đúng: mọi thay đổi user đều tăng token_version
+        return schemas.Principal(
+            user_id=token_data.user_id,
+            username=token_data.username,
+            role=token_data.role,
+        )
+    return schemas.Principal(
+        user_id=data["user_id"],
+        username=data["username"],
+        role=data["role"],
+    )
+
+def _snapshot_user(user: models.User) -> dict:
+    return {column.key: getattr(user, column.key) for column in models.User.__table__.columns}
+
+def _detached_user(data: dict) -> models.User:
+    # Dựng User từ snapshot ở trạng thái detached, để route có thể
+    # merge(load=False) vào session của nó mà không query lại
+    user = models.User(**data)
+    make_transient_to_detached(user)
     return user
 
+def invalidate_cached_user(username: str):
+    user_cache.invalidate(username)
+
 async def get_current_active_user(current_user: models.User = Depends(get_current_user)):
     return current_user
 
-async def get_current_admin_user(current_user: models.User = Depends(get_current_user)):
+async def get_current_admin_user(current_user: schemas.Principal = Depends(get_current_principal)):
     if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
-    return current_user
\ No newline at end of file
+    return current_user
@@ -1,12 +1,25 @@
 #main.py
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
-from datetime import timedelta
 from .routers import users, vocabulary, cycles, chat, admin
-from .database import get_db
+from .database import get_db, get_async_db, SessionLocal, engine
 from . import authentication,schemas
+from .utils.password_pool import password_pool
+from .utils.search_history import search_history_buffer
+from .utils.user_stats import stats_reconciler
+from .utils import query_stats, catalog, quiz_session, read_your_writes
+import logging
+import os
+
+logger = logging.getLogger("stulang.queries")
+
+# Bật để trả số query / thời gian DB của mỗi request trong response header
+DEBUG = os.getenv("DEBUG", "false").lower() in ("1", "true", "yes")
+# Một câu SQL (cùng dạng) lặp lại từ chừng này lần trong một request bị coi là N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
 app = FastAPI(
     title="Vocabulary Learning API",
     description="API for vocabulary learning application",
@@ -20,8 +33,37 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[read_your_writes.HEADER],
 )
 
+@app.middleware("http")
+async def carry_read_your_writes(request: Request, call_next):
+    # Mốc ghi gần nhất do client gửi lại (có thể do worker khác cấp)
+    request.state.write_marker = read_your_writes.parse(request.headers.get(read_your_writes.HEADER))
+    response = await call_next(request)
+    wrote_until = getattr(request.state, "wrote_until", None)
+    user_id = getattr(request.state, "user_id", None)
+    if wrote_until is not None and user_id is not None:
+        response.headers[read_your_writes.HEADER] = read_your_writes.issue(user_id, wrote_until)
+    return response
+
+@app.middleware("http")
+async def count_queries(request: Request, call_next):
+    token = query_stats.start_request()
+    try:
+        response = await call_next(request)
+    finally:
+        stats = query_stats.end_request(token)
+    for shape, count in stats.repeated_shapes(N_PLUS_ONE_THRESHOLD):
+        logger.warning(
+            "Possible N+1 in %s %s: %d x %s",
+            request.method, request.url.path, count, shape[:200]
+        )
+    if DEBUG:
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Time-Ms"] = f"{stats.total_time * 1000:.2f}"
+    return response
+
 # Include routers
 app.include_router(users.router)
 app.include_router(vocabulary.router)
@@ -30,6 +72,50 @@ app.include_router(cycles.router)
 app.include_router(chat.router)
 app.include_router(admin.router)
 
+@app.on_event("startup")
+def load_revoked_refresh_tokens():
+    db = SessionLocal()
+    try:
+        authentication.load_revoked_tokens(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def purge_used_quiz_sessions():
+    db = SessionLocal()
+    try:
+        quiz_session.purge_used(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def build_catalog_indexes():
+    db = SessionLocal()
+    try:
+        catalog.rebuild(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def start_search_history_writer():
+    search_history_buffer.start(engine)
+
+@app.on_event("shutdown")
+def flush_search_history():
+    search_history_buffer.stop()
+
+@app.on_event("startup")
+def start_user_stats_reconciler():
+    stats_reconciler.start(SessionLocal)
+
+@app.on_event("shutdown")
+def stop_user_stats_reconciler():
+    stats_reconciler.stop()
+
+@app.on_event("shutdown")
+def shutdown_password_pool():
+    password_pool.shutdown()
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Vocabulary Learning API", "version": "1.0.0"}
@@ -50,16 +136,21 @@ def test_db_connection(db: Session = Depends(get_db)):
         return {"status": "Database connection failed", "error": str(e)}
 
 @app.post("/token", response_model=schemas.Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authentication.authenticate_user(db, form_data.username, form_data.password)
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await authentication.authenticate_user_async(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=authentication.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = authentication.create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    return authentication.create_token_pair(user)
+
+@app.post("/token/refresh", response_model=schemas.Token)
+async def refresh_access_token(request: schemas.RefreshTokenRequest, db: AsyncSession = Depends(get_async_db)):
+    return await authentication.refresh_tokens(db, request.refresh_token)
+
+@app.post("/token/revoke", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_refresh_token(request: schemas.RefreshTokenRequest, db: AsyncSession = Depends(get_async_db)):
+    await authentication.revoke_refresh_token(db, request.refresh_token)
+    return None
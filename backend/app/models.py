@@ -1,5 +1,5 @@
 #models.py
-from sqlalchemy import Column, Integer, String, Text, Enum, DateTime, ForeignKey, Date, Boolean
+from sqlalchemy import Column, Integer, String, Text, Enum, DateTime, ForeignKey, Date, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -12,6 +12,8 @@ class User(Base):
     password = Column(String(255), nullable=False)
     email = Column(String(100), unique=True, nullable=False)
     role = Column(Enum('user', 'admin', name='user_role'), nullable=False)
+    # Tăng mỗi khi đổi role/mật khẩu/thông tin user để thu hồi các token cũ
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relationships
     cycle = relationship("UserCycle", uselist=False, back_populates="user")
@@ -41,6 +43,13 @@ class Vocabulary(Base):
     user_vocabularies = relationship("UserVocabulary", back_populates="vocabulary")
     cycle_vocabularies = relationship("CycleVocabulary", back_populates="vocabulary")
 
+    # Lọc theo level/topic/part_of_speech rồi sắp xếp/phân trang theo word_id
+    __table_args__ = (
+        Index("ix_vocabulary_level_word_id", "level", "word_id"),
+        Index("ix_vocabulary_topic_word_id", "topic", "word_id"),
+        Index("ix_vocabulary_pos_word_id", "part_of_speech", "word_id"),
+    )
+
 class UserCycle(Base):
     __tablename__ = "UserCycle"
 
@@ -85,6 +94,11 @@ class ChatLog(Base):
     # Relationships
     user = relationship("User", back_populates="chat_logs")
 
+    # Lịch sử chat của một user, mới nhất trước
+    __table_args__ = (
+        Index("ix_chatlogs_user_id_chat_time", "user_id", "chat_time"),
+    )
+
 class AdminVocabAction(Base):
     __tablename__ = "AdminVocabActions"
 
@@ -94,10 +108,30 @@ class AdminVocabAction(Base):
     word_id = Column(Integer, nullable=True)  # Không có foreign key constraint
     word_name = Column(String(100), nullable=True)  # Thêm cột này
     action_time = Column(DateTime, default=datetime.now)
+    # Phiên bản catalog mà thao tác này tạo ra (xem CatalogVersion)
+    catalog_version = Column(Integer, nullable=True)
     
     # Relationship
     admin = relationship("User", foreign_keys=[admin_id])
 
+    __table_args__ = (
+        Index("ix_adminvocabactions_action_time", "action_time"),
+        Index("ix_adminvocabactions_type_time", "action_type", "action_time"),
+        Index("ix_adminvocabactions_catalog_version", "catalog_version"),
+    )
+
+class CatalogVersion(Base):
+    """
+    Phiên bản catalog từ vựng: một dòng duy nhất (id = 1), tăng bằng
+    UPDATE ... SET version = version + 1 trong cùng transaction với thao tác
+    admin. Khóa dòng giữ tới khi commit nên phiên bản tăng theo thứ tự commit
+    (khác action_id, được cấp lúc INSERT).
+    """
+    __tablename__ = "CatalogVersion"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+
 
 class AdminUserAction(Base):
     __tablename__ = "AdminUserActions"
@@ -108,6 +142,10 @@ class AdminUserAction(Base):
     target_user_id = Column(Integer, ForeignKey("Users.user_id", ondelete="NO ACTION", onupdate="NO ACTION"), nullable=False)
     action_time = Column(DateTime, default=datetime.now)
 
+    __table_args__ = (
+        Index("ix_adminuseractions_action_time", "action_time"),
+    )
+
 class SearchHistory(Base):
     __tablename__ = "SearchHistory"
 
@@ -118,4 +156,46 @@ class SearchHistory(Base):
 
     # Relationships
     user = relationship("User", back_populates="search_history")
-    vocabulary = relationship("Vocabulary")
\ No newline at end of file
+    vocabulary = relationship("Vocabulary")
+
+    __table_args__ = (
+        Index("ix_searchhistory_user_id_searched_at", "user_id", "searched_at"),
+    )
+
+class UserStats(Base):
+    """
+    Bộ đếm học tập của từng user, cập nhật cùng transaction với các thao tác
+    học/chu kỳ để dashboard không phải COUNT mỗi lần (xem utils/user_stats.py).
+    """
+    __tablename__ = "UserStats"
+
+    user_id = Column(Integer, ForeignKey("Users.user_id", ondelete="CASCADE"), primary_key=True)
+    learned_count = Column(Integer, nullable=False, default=0, server_default="0")
+    cycle_pending_count = Column(Integer, nullable=False, default=0, server_default="0")
+    learned_a1 = Column(Integer, nullable=False, default=0, server_default="0")
+    learned_a2 = Column(Integer, nullable=False, default=0, server_default="0")
+    learned_b1 = Column(Integer, nullable=False, default=0, server_default="0")
+    learned_b2 = Column(Integer, nullable=False, default=0, server_default="0")
+    learned_c1 = Column(Integer, nullable=False, default=0, server_default="0")
+    learned_c2 = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+class RevokedToken(Base):
+    __tablename__ = "RevokedTokens"
+
+    jti = Column(String(64), primary_key=True)
+    user_id = Column(Integer, ForeignKey("Users.user_id", ondelete="CASCADE"), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, default=datetime.now)
+
+class UsedQuizSession(Base):
+    __tablename__ = "UsedQuizSessions"
+
+    session_id = Column(String(16), primary_key=True)
+    user_id = Column(Integer, ForeignKey("Users.user_id", ondelete="CASCADE"), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime, default=datetime.now)
+
+    __table_args__ = (
+        Index("ix_usedquizsessions_expires_at", "expires_at"),
+    )
@@ -1,4 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
 import pandas as pd
@@ -6,7 +8,13 @@ import io
 from datetime import datetime
 
 from .. import models, schemas, authentication
-from ..database import get_db
+from ..database import get_db, get_read_db, get_async_db, get_pool_status
+from ..utils.user_cache import user_cache
+from ..utils import catalog
+from ..utils.password_pool import password_pool
+from ..utils.search_history import search_history_buffer
+from ..utils.vocabulary_cache import vocabulary_cache
+from ..utils.user_stats import stats_reconciler
 
 router = APIRouter(
     prefix="/admin",
@@ -19,7 +27,7 @@ def get_all_users(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_admin_user)
+    current_user: schemas.Principal = Depends(authentication.get_current_admin_user)
 ):
     users = db.query(models.User).offset(skip).limit(limit).all()
     return users
@@ -28,7 +36,7 @@ def get_all_users(
 def get_user_by_id(
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_admin_user)
+    current_user: schemas.Principal = Depends(authentication.get_current_admin_user)
 ):
     user = db.query(models.User).filter(models.User.user_id == user_id).first()
     if not user:
@@ -36,11 +44,11 @@ def get_user_by_id(
     return user
 
 @router.put("/users/{user_id}", response_model=schemas.User)
-def update_user(
+async def update_user(
     user_id: int,
     user_update: schemas.UserUpdate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.Principal = Depends(authentication.get_current_admin_user)
 ):
     # Prevent admin from modifying themselves through this endpoint
     if user_id == current_user.user_id:
@@ -49,37 +57,43 @@ def update_user(
             detail="Cannot modify own account through admin endpoint"
         )
     
-    db_user = db.query(models.User).filter(models.User.user_id == user_id).first()
+    db_user = await db.get(models.User, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    old_username = db_user.username
+    
     # Update user fields if provided
     if user_update.username is not None:
         # Check if username already exists
-        existing_user = db.query(models.User).filter(
+        result = await db.execute(select(models.User).where(
             models.User.username == user_update.username,
             models.User.user_id != user_id
-        ).first()
-        if existing_user:
+        ))
+        if result.scalars().first():
             raise HTTPException(status_code=400, detail="Username already taken")
         db_user.username = user_update.username
     
     if user_update.email is not None:
         # Check if email already exists
-        existing_email = db.query(models.User).filter(
+        result = await db.execute(select(models.User).where(
             models.User.email == user_update.email,
             models.User.user_id != user_id
-        ).first()
-        if existing_email:
+        ))
+        if result.scalars().first():
             raise HTTPException(status_code=400, detail="Email already registered")
         db_user.email = user_update.email
     
     if user_update.password is not None:
-        db_user.password = authentication.get_password_hash(user_update.password)
+        db_user.password = await authentication.get_password_hash_async(user_update.password)
     
     if user_update.role is not None:
         db_user.role = user_update.role
     
+    # Thu hồi các token đã cấp trước khi sửa
+    if user_update.dict(exclude_unset=True):
+        authentication.bump_token_version(db_user)
+    
     # Log admin action
     admin_action = models.AdminUserAction(
         admin_id=current_user.user_id,
@@ -88,15 +102,16 @@ def update_user(
     )
     db.add(admin_action)
     
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    authentication.invalidate_cached_user(old_username)
+    await db.refresh(db_user)
     return db_user
 
 @router.delete("/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_user(
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_admin_user)
+    current_user: schemas.Principal = Depends(authentication.get_current_admin_user)
 ):
     # Prevent admin from deleting themselves
     if user_id == current_user.user_id:
@@ -119,8 +134,10 @@ def delete_user(
     db.commit()
     
     # Delete user
+    username = db_user.username
     db.delete(db_user)
     db.commit()
+    authentication.invalidate_cached_user(username)
     
     return None
 
@@ -129,7 +146,7 @@ def change_user_role(
     user_id: int,
     role: schemas.UserRole,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_admin_user)
+    current_user: schemas.Principal = Depends(authentication.get_current_admin_user)
 ):
     # Prevent admin from changing their own role
     if user_id == current_user.user_id:
@@ -143,6 +160,7 @@ def change_user_role(
         raise HTTPException(status_code=404, detail="User not found")
     
     db_user.role = role
+    authentication.bump_token_version(db_user)
     
     # Log admin action
     admin_action = models.AdminUserAction(
@@ -153,15 +171,68 @@ def change_user_role(
     db.add(admin_action)
     
     db.commit()
+    authentication.invalidate_cached_user(db_user.username)
     return {"message": f"User role changed to {role}"}
 
+# === METRICS ===
+
+@router.get("/metrics/user-cache")
+def get_user_cache_metrics(
+    current_user: schemas.Principal = Depends(authentication.get_current_admin_user)
+):
+    """Thống kê hit/miss của cache user đã xác thực"""
+    return user_cache.stats()
+
+@router.get("/metrics/password-pool")
+def get_password_pool_metrics(
+    current_user: schemas.Principal = Depends(authentication.get_current_admin_user)
+):
+    """Thống kê pool băm mật khẩu (số job đang chạy, độ sâu hàng đợi, số job bị từ chối)"""
+    return password_pool.stats()
+
+@router.get("/metrics/db-pool")
+def get_db_pool_metrics(
+    current_user: schemas.Principal = Depends(authentication.get_current_admin_user)
+):
+    """Trạng thái connection pool: số connection đang dùng, overflow, thời gian chờ"""
+    return get_pool_status()
+
+@router.get("/metrics/search-history")
+def get_search_history_metrics(
+    current_user: schemas.Principal = Depends(authentication.get_current_admin_user)
+):
+    """Hàng đợi ghi lịch sử tìm kiếm: độ sâu hiện tại, số dòng đã ghi, bị bỏ, lỗi"""
+    return search_history_buffer.stats()
+
+@router.get("/metrics/vocabulary-cache")
+def get_vocabulary_cache_metrics(
+    current_user: schemas.Principal = Depends(authentication.get_current_admin_user)
+):
+    """Thống kê hit/miss của cache dòng Vocabulary (GET /vocabulary/{id} và /vocabulary/batch)"""
+    return vocabulary_cache.stats()
+
+@router.get("/metrics/user-stats")
+def get_user_stats_metrics(
+    current_user: schemas.Principal = Depends(authentication.get_current_admin_user)
+):
+    """Job đối chiếu bộ đếm UserStats: số lần chạy, số dòng lệch đã sửa"""
+    return stats_reconciler.stats()
+
+@router.post("/user-stats/reconcile")
+def reconcile_user_stats(
+    db: Session = Depends(get_db),
+    current_user: schemas.Principal = Depends(authentication.get_current_admin_user)
+):
+    """Đối chiếu ngay bộ đếm UserStats với dữ liệu thật (ví dụ sau khi sửa dữ liệu bằng tay)"""
+    return {"repaired": stats_reconciler.run_once(db)}
+
 # === VOCABULARY MANAGEMENT ===
 
 @router.post("/vocabulary", response_model=schemas.Vocabulary)
 def create_vocabulary(
     vocabulary: schemas.VocabularyCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_admin_user)
+    current_user: schemas.Principal = Depends(authentication.get_current_admin_user)
 ):
     # Check if word already exists
     db_vocabulary = db.query(models.Vocabulary).filter(models.Vocabulary.word == vocabulary.word).first()
@@ -171,8 +242,7 @@ def create_vocabulary(
     # Create new vocabulary
     db_vocabulary = models.Vocabulary(**vocabulary.dict())
     db.add(db_vocabulary)
-    db.commit()
-    db.refresh(db_vocabulary)
+    db.flush()  # Lấy word_id, commit cùng log và phiên bản catalog
     
     # Log admin action
     admin_action = models.AdminVocabAction(
@@ -182,7 +252,10 @@ def create_vocabulary(
         word_name=db_vocabulary.word
     )
     db.add(admin_action)
+    catalog.stamp(db, [admin_action])
     db.commit()
+    db.refresh(db_vocabulary)
+    catalog.refresh(db)
     
     return db_vocabulary
 
@@ -191,7 +264,7 @@ def update_vocabulary(
     word_id: int,
     vocabulary: schemas.VocabularyUpdate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_admin_user)
+    current_user: schemas.Principal = Depends(authentication.get_current_admin_user)
 ):
     db_vocabulary = db.query(models.Vocabulary).filter(models.Vocabulary.word_id == word_id).first()
     if db_vocabulary is None:
@@ -209,16 +282,18 @@ def update_vocabulary(
         word_name=db_vocabulary.word
     )
     db.add(admin_action)
+    catalog.stamp(db, [admin_action])
     
     db.commit()
     db.refresh(db_vocabulary)
+    catalog.refresh(db)
     return db_vocabulary
 
 @router.delete("/vocabulary/{word_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_vocabulary(
     word_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_admin_user)
+    current_user: schemas.Principal = Depends(authentication.get_current_admin_user)
 ):
     db_vocabulary = db.query(models.Vocabulary).filter(models.Vocabulary.word_id == word_id).first()
     if db_vocabulary is None:
@@ -232,11 +307,13 @@ def delete_vocabulary(
         word_name=db_vocabulary.word
     )
     db.add(admin_action)
-    db.commit()
-    
-    # Delete vocabulary
+
+    # Delete vocabulary (cùng transaction với log và phiên bản catalog: phiên bản
+    # không được tăng trước khi từ thực sự bị xóa)
     db.delete(db_vocabulary)
+    catalog.stamp(db, [admin_action])
     db.commit()
+    catalog.refresh(db)
     
     return None
 
@@ -246,8 +323,8 @@ def delete_vocabulary(
 def get_user_actions(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_admin_user)
+    db: Session = Depends(get_read_db),
+    current_user: schemas.Principal = Depends(authentication.get_current_admin_user)
 ):
     actions = db.query(models.AdminUserAction).order_by(
         models.AdminUserAction.action_time.desc()
@@ -259,8 +336,8 @@ def get_user_actions(
 def get_vocabulary_actions(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_admin_user)
+    db: Session = Depends(get_read_db),
+    current_user: schemas.Principal = Depends(authentication.get_current_admin_user)
 ):
     actions = db.query(models.AdminVocabAction).order_by(
         models.AdminVocabAction.action_time.desc()
@@ -273,8 +350,8 @@ def get_vocabulary_actions_by_type(
     action_type: str,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_admin_user)
+    db: Session = Depends(get_read_db),
+    current_user: schemas.Principal = Depends(authentication.get_current_admin_user)
 ):
     """Lấy lịch sử hành động theo loại (add_vocab, edit_vocab, delete_vocab)"""
     if action_type not in ['add_vocab', 'edit_vocab', 'delete_vocab']:
@@ -291,10 +368,10 @@ def get_vocabulary_actions_by_type(
 # === EXCEL IMPORT ===
 
 @router.post("/vocabulary/import-excel", response_model=schemas.ImportResult)
-async def import_vocabulary_from_excel(
+def import_vocabulary_from_excel(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_admin_user)
+    current_user: schemas.Principal = Depends(authentication.get_current_admin_user)
 ):
     """Nhập từ vựng từ file Excel"""
     # Kiểm tra định dạng file
@@ -306,7 +383,9 @@ async def import_vocabulary_from_excel(
     
     try:
         # Đọc file Excel
-        contents = await file.read()
+        # Route đồng bộ chạy trong threadpool nên đọc file trực tiếp,
+        # tránh chạy vòng lặp ghi DB đồng bộ trên event loop
+        contents = file.file.read()
         df = pd.read_excel(io.BytesIO(contents))
         
         # Kiểm tra các cột bắt buộc
@@ -348,6 +427,7 @@ async def import_vocabulary_from_excel(
         duplicate_count = 0
         error_count = 0
         error_details = []
+        imported_actions = []
         
         for index, row in df.iterrows():
             try:
@@ -388,6 +468,7 @@ async def import_vocabulary_from_excel(
                     word_name=new_vocab.word
                 )
                 db.add(admin_action)
+                imported_actions.append(admin_action)
                 
                 success_count += 1
                 
@@ -395,9 +476,17 @@ async def import_vocabulary_from_excel(
                 error_count += 1
                 error_details.append(f"Lỗi ở dòng {index + 2}: {str(e)}")
         
+        # Cả lô dùng chung một phiên bản catalog, cấp ngay trước commit
+        if imported_actions:
+            catalog.stamp(db, imported_actions)
+        
         # Commit tất cả thay đổi
         db.commit()
         
+        # Cập nhật các index của catalog bằng một query cho toàn bộ từ mới
+        if imported_actions:
+            catalog.refresh(db)
+        
         # Trả về kết quả
         return {
             "total_rows": len(df),
@@ -416,7 +505,7 @@ async def import_vocabulary_from_excel(
 
 @router.get("/vocabulary/excel-template")
 def get_excel_template(
-    current_user: models.User = Depends(authentication.get_current_admin_user)
+    current_user: schemas.Principal = Depends(authentication.get_current_admin_user)
 ):
     """Tải về file Excel mẫu để nhập từ vựng"""
     # Tạo DataFrame mẫu
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
 from datetime import datetime
 
 from .. import models, schemas, authentication
-from ..database import get_db
+from ..database import get_read_db, get_async_db
 from ..utils.ai_service import get_ai_response
 
 router = APIRouter(
@@ -16,14 +18,17 @@ router = APIRouter(
 @router.post("/", response_model=schemas.ChatResponse)
 async def chat_with_ai(
     message: schemas.ChatMessage,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
 ):
     try:
         # Get recent chat history for context
-        chat_history = db.query(models.ChatLog).filter(
-            models.ChatLog.user_id == current_user.user_id
-        ).order_by(models.ChatLog.chat_time.desc()).limit(5).all()
+        result = await db.execute(
+            select(models.ChatLog).where(
+                models.ChatLog.user_id == current_user.user_id
+            ).order_by(models.ChatLog.chat_time.desc()).limit(5)
+        )
+        chat_history = result.scalars().all()
         
         # Format chat history for AI context
         context = []
@@ -41,7 +46,7 @@ async def chat_with_ai(
             ai_response=ai_response_text
         )
         db.add(chat_log)
-        db.commit()
+        await db.commit()
         
         return {"response": ai_response_text}
     except Exception as e:
@@ -56,8 +61,8 @@ async def chat_with_ai(
 def get_chat_history(
     skip: int = 0,
     limit: int = 50,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_active_user)
+    db: Session = Depends(get_read_db),
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
 ):
     chat_logs = db.query(models.ChatLog).filter(
         models.ChatLog.user_id == current_user.user_id
@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import logging
+import random
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timedelta
@@ -6,7 +8,11 @@ from sqlalchemy.orm import joinedload
 from sqlalchemy import func
 
 from .. import models, schemas, authentication
-from ..database import get_db
+from ..database import get_db, get_read_db
+from ..utils import user_stats, catalog, quiz_session
+from ..utils.distractors import distractor_pool
+from ..utils.facets import catalog_facets
+from ..utils.upsert import upsert
 
 router = APIRouter(
     prefix="/cycles",
@@ -14,11 +20,15 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+logger = logging.getLogger("stulang.cycles")
+
+MAX_PRACTICE_PAGE_SIZE = 100
+
 @router.post("/", response_model=schemas.UserCycle)
 def create_cycle(
     cycle: schemas.UserCycleCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_active_user)
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
 ):
     # Tính toán end_datetime
     start_time = datetime.now()
@@ -78,7 +88,7 @@ def create_quick_cycle(
     minutes: int = 0,   
     seconds: int = 0,   
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_active_user)
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
 ):
     """
     Tạo chu kỳ học với thời gian do người dùng nhập
@@ -148,7 +158,7 @@ def create_quick_cycle(
 @router.get("/", response_model=schemas.UserCycle)
 def get_user_cycle(
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_active_user)
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
 ):
     cycle = db.query(models.UserCycle).filter(
         models.UserCycle.user_id == current_user.user_id
@@ -162,7 +172,7 @@ def get_user_cycle(
 @router.get("/time-remaining")
 def get_cycle_time_remaining(
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_active_user)
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
 ):
     """Xem thời gian còn lại của chu kỳ hiện tại"""
     cycle = db.query(models.UserCycle).filter(
@@ -208,7 +218,7 @@ def get_cycle_time_remaining(
 @router.get("/statistics")
 def get_cycle_statistics(
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_active_user)
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
 ):
     """Thống kê chu kỳ hiện tại"""
     cycle = db.query(models.UserCycle).filter(
@@ -218,19 +228,12 @@ def get_cycle_statistics(
     if not cycle:
         raise HTTPException(status_code=404, detail="No learning cycle found")
     
-    # Đếm từ trong cycle (chỉ còn pending)
-    total_in_cycle = db.query(models.CycleVocabulary).filter(
-        models.CycleVocabulary.user_id == current_user.user_id
-    ).count()
-    
-    # Đếm từ đã học (tổng)
-    total_learned = db.query(models.UserVocabulary).filter(
-        models.UserVocabulary.user_id == current_user.user_id
-    ).count()
+    # Số từ trong cycle (chỉ còn pending) và tổng số từ đã học, từ bảng UserStats
+    counters = user_stats.get(db, current_user.user_id)
     
     return {
-        "cycle_words_remaining": total_in_cycle,
-        "total_words_learned": total_learned,
+        "cycle_words_remaining": counters["cycle_pending_count"],
+        "total_words_learned": counters["learned_count"],
         "cycle_start": cycle.start_datetime,
         "cycle_end": cycle.end_datetime
     }
@@ -239,7 +242,7 @@ def get_cycle_statistics(
 def add_vocabulary_to_cycle(
     cycle_vocab: schemas.CycleVocabularyCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_active_user)
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
 ):
     """
     Thêm từ vựng vào chu kỳ - chỉ khi chu kỳ còn hoạt động
@@ -294,6 +297,7 @@ def add_vocabulary_to_cycle(
     )
     
     db.add(db_cycle_vocab)
+    user_stats.record(db, current_user.user_id, cycle_pending=1)
     db.commit()
     db.refresh(db_cycle_vocab)
     
@@ -309,8 +313,8 @@ def get_cycle_vocabulary(
     part_of_speech: Optional[str] = None,
     sort_by: Optional[str] = "word_id",
     sort_order: Optional[str] = "asc",
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_active_user)
+    db: Session = Depends(get_read_db),
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
 ):
     """
     Lấy danh sách từ vựng trong chu kỳ với phân trang và filter
@@ -379,7 +383,7 @@ def update_vocabulary_status(
     word_id: int,
     update: schemas.CycleVocabularyUpdate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_active_user)
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
 ):
     # Find the cycle vocabulary
     cycle_vocab = db.query(models.CycleVocabulary).filter(
@@ -398,6 +402,7 @@ def update_vocabulary_status(
             models.UserVocabulary.word_id == word_id
         ).first()
         
+        learned_levels = []
         if not user_vocab:
             user_vocab = models.UserVocabulary(
                 user_id=current_user.user_id,
@@ -405,11 +410,14 @@ def update_vocabulary_status(
                 learned_at=datetime.now()
             )
             db.add(user_vocab)
+            catalog.ensure_loaded(db)
+            learned_levels.append(catalog_facets.level(word_id))
         else:
             user_vocab.learned_at = datetime.now()
         
         # Xóa khỏi cycle
         db.delete(cycle_vocab)
+        user_stats.record(db, current_user.user_id, learned_levels=learned_levels, cycle_pending=-1)
         db.commit()
         
         # Return thông báo thay vì cycle_vocab (vì đã xóa)
@@ -428,7 +436,7 @@ def update_vocabulary_status(
 def remove_vocabulary_from_cycle(
     word_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_active_user)
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
 ):
     """Xóa từ vựng khỏi chu kỳ"""
     cycle_vocab = db.query(models.CycleVocabulary).filter(
@@ -440,25 +448,126 @@ def remove_vocabulary_from_cycle(
         raise HTTPException(status_code=404, detail="Vocabulary not found in cycle")
     
     db.delete(cycle_vocab)
+    user_stats.record(db, current_user.user_id, cycle_pending=-1)
     db.commit()
     
     return {"message": "Vocabulary removed from cycle successfully"}
 
+def _get_cycle_or_404(db: Session, user_id: int) -> models.UserCycle:
+    cycle = db.query(models.UserCycle).filter(models.UserCycle.user_id == user_id).first()
+    if not cycle:
+        raise HTTPException(status_code=404, detail="No active learning cycle found")
+    return cycle
+
+
+def _ensure_distractors(db: Session):
+    # Đáp án sai được rút từ kho định nghĩa trong bộ nhớ thay vì nạp cả bảng mỗi request
+    catalog.ensure_loaded(db)
+    if len(distractor_pool) < 4:
+        raise HTTPException(
+            status_code=400,
+            detail="Not enough vocabulary in database to create multiple choice questions"
+        )
+
+
+def _require_client_graded_practice():
+    """Các endpoint cũ để client tự chấm bài bị tắt trừ khi bật ALLOW_CLIENT_GRADED_PRACTICE"""
+    if not quiz_session.ALLOW_CLIENT_GRADED_PRACTICE:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Client-graded practice is disabled, use /cycles/practice-sessions"
+        )
+
+
+def _question(cycle_vocab: models.CycleVocabulary, correct_position: int, rng: Optional[random.Random] = None) -> dict:
+    """
+    Câu hỏi trắc nghiệm cho một từ, đáp án đúng nằm ở vị trí `correct_position`.
+
+    `rng` cố định theo phiên (quiz_session.question_rng) để tải lại cùng câu
+    hỏi ra cùng đáp án sai; không truyền thì dùng random toàn cục.
+    """
+    vocab = cycle_vocab.vocabulary
+    # Rút 3 định nghĩa sai, ưu tiên từ cùng level, từ loại và topic để câu hỏi không quá dễ
+    choices = distractor_pool.sample(
+        vocab.definition, 3, vocab.level, vocab.part_of_speech, vocab.topic, rng=rng
+    )
+    while len(choices) < 3:
+        choices.append(f"Định nghĩa không chính xác {len(choices) + 1}")
+    choices.insert(correct_position, vocab.definition)
+    return {
+        "word_id": vocab.word_id,
+        "word": vocab.word,
+        "pronunciation": vocab.pronunciation,
+        "example": vocab.example,
+        "level": vocab.level,
+        "topic": vocab.topic,
+        "status": cycle_vocab.status,
+        "choices": choices,
+    }
+
+
+def _apply_practice_results(db: Session, user_id: int, correct_word_ids: List[int]) -> List[int]:
+    """
+    Chuyển các từ trả lời đúng từ chu kỳ sang UserVocabulary; trả về các từ đã xử lý.
+
+    Xử lý theo tập hợp nên số câu lệnh cố định, không phụ thuộc số câu hỏi:
+    một SELECT ... IN cho CycleVocabulary, một cho UserVocabulary, một câu
+    upsert nhiều dòng và một DELETE ... IN. Level của từ mới học lấy từ index
+    catalog nên không phải nạp Vocabulary. Route tự commit.
+    """
+    word_ids = list(dict.fromkeys(correct_word_ids))
+    if not word_ids:
+        return []
+    
+    in_cycle = {word_id for (word_id,) in db.query(models.CycleVocabulary.word_id).filter(
+        models.CycleVocabulary.user_id == user_id,
+        models.CycleVocabulary.word_id.in_(word_ids)
+    )}
+    learned_words = [word_id for word_id in word_ids if word_id in in_cycle]
+    if not learned_words:
+        return []
+    
+    already_learned = {word_id for (word_id,) in db.query(models.UserVocabulary.word_id).filter(
+        models.UserVocabulary.user_id == user_id,
+        models.UserVocabulary.word_id.in_(learned_words)
+    )}
+    
+    # Mark-learned: thêm vào UserVocabulary (từ đã học thì cập nhật learned_at)
+    now = datetime.now()
+    upsert(
+        db,
+        models.UserVocabulary,
+        [{"user_id": user_id, "word_id": word_id, "learned_at": now} for word_id in learned_words],
+        key_columns=("user_id", "word_id"),
+        update_columns=("learned_at",),
+    )
+    
+    # XÓA khỏi cycle (thay vì chuyển thành learned)
+    db.query(models.CycleVocabulary).filter(
+        models.CycleVocabulary.user_id == user_id,
+        models.CycleVocabulary.word_id.in_(learned_words)
+    ).delete(synchronize_session=False)
+    
+    catalog.ensure_loaded(db)
+    learned_levels = [catalog_facets.level(word_id) for word_id in learned_words if word_id not in already_learned]
+    user_stats.record(db, user_id, learned_levels=learned_levels, cycle_pending=-len(learned_words))
+    return learned_words
+
+
 @router.get("/practice-set", response_model=List[schemas.VocabularyQuiz])
 def get_vocabulary_for_practice(
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_active_user)
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
 ):
     """
     Tạo bộ câu hỏi trắc nghiệm từ tất cả từ vựng trong chu kỳ
+
+    Endpoint cũ: trả kèm correct_answer cho client, chỉ bật khi
+    ALLOW_CLIENT_GRADED_PRACTICE=true. Client mới dùng
+    /cycles/practice-sessions để server giữ đáp án và chấm bài.
     """
-    # Kiểm tra chu kỳ hiện tại
-    cycle = db.query(models.UserCycle).filter(
-        models.UserCycle.user_id == current_user.user_id
-    ).first()
-    
-    if not cycle:
-        raise HTTPException(status_code=404, detail="No active learning cycle found")
+    _require_client_graded_practice()
+    _get_cycle_or_404(db, current_user.user_id)
     
     # Lấy TẤT CẢ từ vựng trong chu kỳ
     cycle_words = db.query(models.CycleVocabulary).join(
@@ -470,51 +579,15 @@ def get_vocabulary_for_practice(
     if not cycle_words:
         raise HTTPException(status_code=404, detail="No vocabulary found in cycle")
     
-    # Lấy tất cả định nghĩa từ toàn bộ database để làm câu trả lời sai
-    all_definitions = db.query(models.Vocabulary.definition).all()
-    all_definitions = [def_tuple[0] for def_tuple in all_definitions]
-    
-    if len(all_definitions) < 4:
-        raise HTTPException(
-            status_code=400,
-            detail="Not enough vocabulary in database to create multiple choice questions"
-        )
-    
-    import random
+    _ensure_distractors(db)
     
     quiz_questions = []
     
     # Tạo câu hỏi cho TẤT CẢ từ trong cycle
     for cycle_vocab in cycle_words:
-        vocab = cycle_vocab.vocabulary
-        correct_definition = vocab.definition
-        
-        # Lấy 3 định nghĩa sai từ toàn bộ database
-        wrong_definitions = [d for d in all_definitions if d != correct_definition]
-        
-        if len(wrong_definitions) < 3:
-            while len(wrong_definitions) < 3:
-                wrong_definitions.append(f"Định nghĩa không chính xác {len(wrong_definitions) + 1}")
-        
-        selected_wrong = random.sample(wrong_definitions, 3)
-        
-        # Tạo danh sách 4 lựa chọn
-        all_choices = [correct_definition] + selected_wrong
-        random.shuffle(all_choices)
-        correct_answer_index = all_choices.index(correct_definition)
-        
-        quiz_question = {
-            "word_id": vocab.word_id,
-            "word": vocab.word,
-            "pronunciation": vocab.pronunciation,
-            "example": vocab.example,
-            "level": vocab.level,
-            "topic": vocab.topic,
-            "status": cycle_vocab.status,
-            "choices": all_choices,
-            "correct_answer": correct_answer_index
-        }
-        
+        correct_answer_index = random.randrange(quiz_session.CHOICES_PER_QUESTION)
+        quiz_question = _question(cycle_vocab, correct_answer_index)
+        quiz_question["correct_answer"] = correct_answer_index
         quiz_questions.append(quiz_question)
     
     # Xáo trộn thứ tự câu hỏi
@@ -526,64 +599,152 @@ def get_vocabulary_for_practice(
 def submit_practice_results(
     practice_data: schemas.VocabularyPracticeQuiz,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_active_user)
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
 ):
     """
     Cập nhật kết quả kiểm tra - xóa từ learned khỏi cycle
+
+    Endpoint cũ: tin is_correct do client gửi lên, chỉ bật khi
+    ALLOW_CLIENT_GRADED_PRACTICE=true. Client mới dùng
+    /cycles/practice-sessions/submit để server tự chấm.
     """
-    current_cycle = db.query(models.UserCycle).filter(
-        models.UserCycle.user_id == current_user.user_id
-    ).first()
+    _require_client_graded_practice()
+    _get_cycle_or_404(db, current_user.user_id)
+    logger.warning("Client-graded practice results submitted by user %d", current_user.user_id)
     
-    if not current_cycle:
-        raise HTTPException(status_code=404, detail="No active learning cycle found")
+    correct_word_ids = [result.word_id for result in practice_data.quiz_results if result.is_correct]
+    learned_words = _apply_practice_results(db, current_user.user_id, correct_word_ids)
+    db.commit()
     
-    learned_words = []
+    return {
+        "message": "Practice results updated successfully",
+        "learned_words": learned_words,
+        "total_learned": len(learned_words)
+    }
+
+@router.post("/practice-sessions", response_model=schemas.PracticeSession)
+def create_practice_session(
+    db: Session = Depends(get_read_db),
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
+):
+    """
+    Bắt đầu một phiên làm bài với toàn bộ từ trong chu kỳ.
+
+    Chỉ đọc word_id; câu hỏi được lấy theo trang qua /practice-sessions/questions.
+    Đáp án đúng được suy ra từ session_token (đã ký) nên không lưu ở server.
+    """
+    _get_cycle_or_404(db, current_user.user_id)
     
-    for result in practice_data.quiz_results:
-        cycle_vocab = db.query(models.CycleVocabulary).filter(
-            models.CycleVocabulary.user_id == current_user.user_id,
-            models.CycleVocabulary.word_id == result.word_id
-        ).first()
-        
-        if not cycle_vocab:
-            continue
-        
-        # Nếu trả lời đúng
-        if result.is_correct:
-            # Mark-learned: Thêm vào UserVocabulary
-            user_vocab = db.query(models.UserVocabulary).filter(
-                models.UserVocabulary.user_id == current_user.user_id,
-                models.UserVocabulary.word_id == result.word_id
-            ).first()
-            
-            if not user_vocab:
-                user_vocab = models.UserVocabulary(
-                    user_id=current_user.user_id,
-                    word_id=result.word_id,
-                    learned_at=datetime.now()
-                )
-                db.add(user_vocab)
-            else:
-                user_vocab.learned_at = datetime.now()
-            
-            # XÓA khỏi cycle (thay vì chuyển thành learned)
-            db.delete(cycle_vocab)
-            learned_words.append(result.word_id)
+    word_ids = [word_id for (word_id,) in db.query(models.CycleVocabulary.word_id).filter(
+        models.CycleVocabulary.user_id == current_user.user_id
+    )]
     
+    if not word_ids:
+        raise HTTPException(status_code=404, detail="No vocabulary found in cycle")
+    
+    _ensure_distractors(db)
+    token, session = quiz_session.issue(current_user.user_id, word_ids)
+    
+    return {
+        "session_token": token,
+        "total_questions": len(session.word_ids),
+        "expires_at": datetime.fromtimestamp(session.expires_at),
+    }
+
+@router.get("/practice-sessions/questions", response_model=schemas.PracticeQuestionPage)
+def get_practice_questions(
+    session_token: str,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=MAX_PRACTICE_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
+):
+    """
+    Một trang câu hỏi của phiên làm bài (không kèm đáp án đúng).
+
+    Từ đã rời khỏi chu kỳ sau khi bắt đầu phiên sẽ bị bỏ qua.
+    """
+    try:
+        session = quiz_session.open_session(session_token, current_user.user_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    page_ids = session.word_ids[skip:skip + limit]
+    cycle_words = {}
+    if page_ids:
+        cycle_words = {
+            cycle_vocab.word_id: cycle_vocab
+            for cycle_vocab in db.query(models.CycleVocabulary).filter(
+                models.CycleVocabulary.user_id == current_user.user_id,
+                models.CycleVocabulary.word_id.in_(page_ids)
+            ).options(joinedload(models.CycleVocabulary.vocabulary))
+        }
+        _ensure_distractors(db)
+    
+    items = [
+        _question(
+            cycle_words[word_id],
+            quiz_session.correct_index(session, word_id),
+            quiz_session.question_rng(session, word_id),
+        )
+        for word_id in page_ids if word_id in cycle_words
+    ]
+    next_skip = skip + limit if skip + limit < len(session.word_ids) else None
+    
+    return {"items": items, "total": len(session.word_ids), "next_skip": next_skip}
+
+@router.post("/practice-sessions/submit", response_model=schemas.PracticeSubmissionResult)
+def submit_practice_session(
+    submission: schemas.PracticeSubmission,
+    db: Session = Depends(get_db),
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
+):
+    """
+    Chấm bài theo đáp án trong session_token rồi chuyển các từ trả lời đúng
+    ra khỏi chu kỳ. Câu trả lời cho từ không thuộc phiên bị bỏ qua. Mỗi phiên
+    chỉ nộp được một lần nên đáp án đúng trong kết quả không dùng lại được.
+    """
+    try:
+        session = quiz_session.open_session(submission.session_token, current_user.user_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    _get_cycle_or_404(db, current_user.user_id)
+    if not quiz_session.consume(db, session):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Quiz session already submitted")
+    
+    in_session = set(session.word_ids)
+    results = []
+    graded = set()
+    for answer in submission.answers:
+        if answer.word_id not in in_session or answer.word_id in graded:
+            continue
+        graded.add(answer.word_id)
+        correct_answer = quiz_session.correct_index(session, answer.word_id)
+        results.append({
+            "word_id": answer.word_id,
+            "selected_answer": answer.selected_answer,
+            "correct_answer": correct_answer,
+            "is_correct": answer.selected_answer == correct_answer,
+        })
+    
+    correct_word_ids = [result["word_id"] for result in results if result["is_correct"]]
+    learned_words = _apply_practice_results(db, current_user.user_id, correct_word_ids)
     db.commit()
     
     return {
-        "message": "Practice results updated successfully",
+        "results": results,
+        "correct_count": len(correct_word_ids),
+        "total_questions": len(session.word_ids),
         "learned_words": learned_words,
-        "total_learned": len(learned_words)
+        "total_learned": len(learned_words),
     }
 
 @router.post("/end-current")
 def end_current_cycle(
     new_cycle_data: schemas.UserCycleCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_active_user)
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
 ):
     """
     Kết thúc chu kỳ hiện tại và tạo chu kỳ mới - đơn giản
@@ -1,11 +1,12 @@
 #router/user.py
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
-from datetime import timedelta
 
 from .. import models, schemas, authentication
-from ..database import get_db
+from ..database import get_db, get_async_db
 
 router = APIRouter(
     prefix="/users",
@@ -14,16 +15,16 @@ router = APIRouter(
 )
 
 @router.post("/register", response_model=schemas.User)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
-    if db_user:
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(models.User).where(models.User.username == user.username))
+    if result.scalars().first():
         raise HTTPException(status_code=400, detail="Username already registered")
     
-    db_email = db.query(models.User).filter(models.User.email == user.email).first()
-    if db_email:
+    result = await db.execute(select(models.User).where(models.User.email == user.email))
+    if result.scalars().first():
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = authentication.get_password_hash(user.password)
+    hashed_password = await authentication.get_password_hash_async(user.password)
     db_user = models.User(
         username=user.username,
         email=user.email,
@@ -31,47 +32,56 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
         role="user"
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @router.post("/login", response_model=schemas.Token)
-def login_for_access_token(user_credentials: schemas.UserLogin, db: Session = Depends(get_db)):
-    user = authentication.authenticate_user(db, user_credentials.username, user_credentials.password)
+async def login_for_access_token(user_credentials: schemas.UserLogin, db: AsyncSession = Depends(get_async_db)):
+    user = await authentication.authenticate_user_async(db, user_credentials.username, user_credentials.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=authentication.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = authentication.create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    return authentication.create_token_pair(user)
+
+@router.post("/refresh", response_model=schemas.Token)
+async def refresh_access_token(request: schemas.RefreshTokenRequest, db: AsyncSession = Depends(get_async_db)):
+    return await authentication.refresh_tokens(db, request.refresh_token)
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(request: schemas.RefreshTokenRequest, db: AsyncSession = Depends(get_async_db)):
+    await authentication.revoke_refresh_token(db, request.refresh_token)
+    return None
 
 @router.get("/me", response_model=schemas.User)
 def read_users_me(current_user: models.User = Depends(authentication.get_current_active_user)):
     return current_user
 
-@router.put("/me/password", response_model=schemas.User)
-def update_password(
+@router.put("/me/password", response_model=schemas.PasswordUpdateResult)
+async def update_password(
     password_update: schemas.PasswordUpdate,
     current_user: models.User = Depends(authentication.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Xác thực mật khẩu cũ trước khi cho phép đổi mật khẩu
-    if not authentication.verify_password(password_update.current_password, current_user.password):
+    if not await authentication.verify_password_async(password_update.current_password, current_user.password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect"
         )
     
     # Đổi mật khẩu
-    current_user.password = authentication.get_password_hash(password_update.new_password)
-    db.commit()
-    db.refresh(current_user)
-    return current_user
+    user = await db.merge(current_user, load=False)
+    user.password = await authentication.get_password_hash_async(password_update.new_password)
+    authentication.bump_token_version(user)
+    await db.commit()
+    authentication.invalidate_cached_user(user.username)
+    await db.refresh(user)
+    # Token hiện tại đã bị thu hồi cùng các phiên khác: cấp lại cho phiên này
+    return {**schemas.User.from_orm(user).dict(), **authentication.create_token_pair(user)}
 
 @router.put("/me/email", response_model=schemas.User)
 def update_email(
@@ -92,10 +102,12 @@ def update_email(
         )
     
     # Cập nhật email
-    current_user.email = email_update.email
+    user = db.merge(current_user, load=False)
+    user.email = email_update.email
     db.commit()
-    db.refresh(current_user)
-    return current_user
+    authentication.invalidate_cached_user(user.username)
+    db.refresh(user)
+    return user
 
 
 @router.get("/vocabulary", response_model=List[schemas.UserVocabulary])
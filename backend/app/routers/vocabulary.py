@@ -1,11 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, distinct
+from sqlalchemy import tuple_
 from typing import List, Optional, Dict
 from datetime import datetime
 
 from .. import models, schemas, authentication
-from ..database import get_db
+from ..database import get_db, get_read_db, SessionLocal
+from ..utils import catalog
+from ..utils.search_index import search_index
+from ..utils.autocomplete import prefix_index
+from ..utils.fuzzy_index import fuzzy_index, MAX_EDIT_DISTANCE
+from ..utils.fulltext_index import fulltext_index, DEFAULT_WEIGHTS
+from ..utils.pagination import encode_cursor, decode_cursor
+from ..utils.facets import catalog_facets
+from ..utils.search_history import search_history_buffer
+from ..utils.vocabulary_cache import vocabulary_cache
+from ..utils.snapshot import accepts_gzip, iter_snapshot
+from ..utils import user_stats
+from ..utils.etag import make_etag, if_none_match, set_etag, not_modified
 
 router = APIRouter(
     prefix="/vocabulary",
@@ -13,8 +26,16 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+MAX_SEARCH_LIMIT = 100
+MAX_AUTOCOMPLETE_LIMIT = 50
+MAX_CHANGES_LIMIT = 1000
+# Các cột sắp xếp được hỗ trợ (đều có index kèm word_id cho keyset pagination)
+KEYSET_SORT_FIELDS = ["word_id", "word", "level", "topic"]
+
 @router.get("/", response_model=schemas.PaginatedVocabulary)
 def get_vocabulary(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 5,
     level: Optional[str] = None,
@@ -22,9 +43,30 @@ def get_vocabulary(
     part_of_speech: Optional[str] = None,
     sort_by: Optional[str] = "word_id",
     sort_order: Optional[str] = "asc",
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_active_user)
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    db: Session = Depends(get_read_db),
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
 ):
+    """
+    Lấy danh sách từ vựng có lọc, sắp xếp và phân trang.
+
+    Hai chế độ phân trang:
+    - offset (mặc định): `skip`/`limit` như trước, trả về total/page/pages.
+    - cursor: truyền `next_cursor` của trang trước vào `cursor`; trang kế được
+      lấy bằng điều kiện (cột sắp xếp, word_id) > vị trí cuối trang trước nên
+      trang sâu nhanh như trang đầu. Không đếm tổng và bỏ qua `skip`.
+
+    `include_total=false` bỏ câu COUNT ở chế độ offset.
+
+    Trả về ETag theo phiên bản catalog; If-None-Match khớp thì trả 304 mà
+    không query DB.
+    """
+    etag = make_etag("vocabulary", catalog.version(db))
+    if if_none_match(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    
     # Xây dựng query cơ bản
     query = db.query(models.Vocabulary)
     
@@ -39,113 +81,351 @@ def get_vocabulary(
         query = query.filter(models.Vocabulary.part_of_speech == part_of_speech)
     
     # Đếm tổng số từ vựng thỏa mãn điều kiện (trước khi phân trang)
-    total_count = query.count()
+    total_count = query.count() if include_total and cursor is None else None
     
-    # Áp dụng sắp xếp
-    valid_sort_fields = ["word_id", "word", "level", "topic", "created_at"]
-    if sort_by in valid_sort_fields:
-        sort_column = getattr(models.Vocabulary, sort_by)
-        
-        if sort_order.lower() == "desc":
-            query = query.order_by(sort_column.desc())
+    # Áp dụng sắp xếp; word_id làm khóa phụ để thứ tự ổn định giữa các trang
+    if sort_by not in KEYSET_SORT_FIELDS:
+        sort_by = "word_id"
+    sort_order = "desc" if (sort_order or "").lower() == "desc" else "asc"
+    sort_column = getattr(models.Vocabulary, sort_by)
+    descending = sort_order == "desc"
+    
+    if cursor is not None:
+        try:
+            last_value, last_id = decode_cursor(cursor, sort_by, sort_order)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        # So sánh row value để database dùng được index (cột sắp xếp, word_id)
+        if sort_by == "word_id":
+            position, last = models.Vocabulary.word_id, last_id
         else:
-            query = query.order_by(sort_column.asc())
+            position, last = tuple_(sort_column, models.Vocabulary.word_id), tuple_(last_value, last_id)
+        query = query.filter(position < last if descending else position > last)
+    
+    order = [sort_column.desc() if descending else sort_column.asc()]
+    if sort_by != "word_id":
+        order.append(models.Vocabulary.word_id.desc() if descending else models.Vocabulary.word_id.asc())
+    query = query.order_by(*order)
     
-    # Áp dụng phân trang
-    vocabulary = query.offset(skip).limit(limit).all()
+    # Áp dụng phân trang; lấy dư một dòng để biết còn trang sau không
+    if cursor is None:
+        query = query.offset(skip)
+    rows = query.limit(limit + 1).all() if limit > 0 else []
+    vocabulary = rows[:limit]
+    
+    next_cursor = None
+    if len(rows) > limit and vocabulary:
+        last = vocabulary[-1]
+        next_cursor = encode_cursor(sort_by, sort_order, getattr(last, sort_by), last.word_id)
     
     # Trả về kết quả kèm theo thông tin phân trang
+    if cursor is not None:
+        return {"items": vocabulary, "next_cursor": next_cursor}
     return {
         "items": vocabulary,
         "total": total_count,
         "page": skip // limit + 1 if limit > 0 else 1,
-        "pages": (total_count + limit - 1) // limit if limit > 0 else 1
+        "pages": ((total_count + limit - 1) // limit if limit > 0 else 1) if total_count is not None else None,
+        "next_cursor": next_cursor
     }
 
 @router.get("/topics", response_model=List[str])
 def get_topics(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_active_user)
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
 ):
-    """Lấy danh sách tất cả các chủ đề từ vựng hiện có"""
-    topics = db.query(distinct(models.Vocabulary.topic)).all()
-    return [topic[0] for topic in topics if topic[0]]  # Loại bỏ các giá trị None
+    """Lấy danh sách tất cả các chủ đề từ vựng hiện có (từ cache thống kê catalog)"""
+    etag = make_etag("topics", catalog.version(db))
+    if if_none_match(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    return catalog_facets.topics()
 
 @router.get("/levels", response_model=List[str])
 def get_levels(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_active_user)
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
 ):
-    """Lấy danh sách tất cả các cấp độ từ vựng hiện có"""
-    levels = db.query(distinct(models.Vocabulary.level)).all()
-    return [level[0] for level in levels if level[0]]  # Loại bỏ các giá trị None
+    """Lấy danh sách tất cả các cấp độ từ vựng hiện có (từ cache thống kê catalog)"""
+    etag = make_etag("levels", catalog.version(db))
+    if if_none_match(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    return catalog_facets.levels()
 
 @router.get("/statistics", response_model=schemas.VocabularyStatistics)
 def get_vocabulary_statistics(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_active_user)
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
 ):
-    """Lấy thống kê về từ vựng"""
-    # Tổng số từ vựng
-    total_count = db.query(func.count(models.Vocabulary.word_id)).scalar()
+    """
+    Lấy thống kê về từ vựng.
+
+    Phần catalog lấy từ cache, số từ đã học từ bảng UserStats (một lần đọc
+    theo khóa chính). ETag gồm phiên bản catalog và số từ đã học của user.
+    """
+    version = catalog.version(db)
+    total_count = catalog_facets.total
     
     # Số từ đã học
-    learned_count = db.query(func.count(models.UserVocabulary.word_id)).filter(
-        models.UserVocabulary.user_id == current_user.user_id
-    ).scalar()
-    
-    # Phân loại theo cấp độ
-    level_stats = db.query(
-        models.Vocabulary.level, 
-        func.count(models.Vocabulary.word_id).label('count')
-    ).group_by(models.Vocabulary.level).all()
-    
-    # Phân loại theo chủ đề
-    topic_stats = db.query(
-        models.Vocabulary.topic, 
-        func.count(models.Vocabulary.word_id).label('count')
-    ).group_by(models.Vocabulary.topic).all()
+    counters = user_stats.get(db, current_user.user_id)
+    learned_count = counters["learned_count"]
+    
+    etag = make_etag("statistics", version, *(counters[f"learned_{level}"] for level in user_stats.LEVELS))
+    if if_none_match(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
     
     return {
         "total_count": total_count,
         "learned_count": learned_count,
         "remaining_count": total_count - learned_count,
-        "level_distribution": {level: count for level, count in level_stats if level},
-        "topic_distribution": {topic: count for topic, count in topic_stats if topic}
+        "level_distribution": catalog_facets.level_distribution(),
+        "topic_distribution": catalog_facets.topic_distribution(),
+        "learned_level_distribution": user_stats.learned_by_level(counters)
     }
 
 @router.get("/search", response_model=List[schemas.Vocabulary])
 def search_vocabulary(
     keyword: str,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_active_user)
+    response: Response,
+    skip: int = 0,
+    limit: int = 20,
+    fuzzy: bool = False,
+    max_distance: int = MAX_EDIT_DISTANCE,
+    db: Session = Depends(get_read_db),
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
 ):
-    # Search for vocabulary
-    vocabulary = db.query(models.Vocabulary).filter(
-        models.Vocabulary.word.ilike(f"%{keyword}%")
-    ).all()
+    """
+    Tìm từ vựng theo chuỗi con của `word`, dùng index trigram trong bộ nhớ.
+
+    Kết quả xếp hạng (trùng khớp > tiền tố > chuỗi con) và phân trang;
+    tổng số kết quả trả về ở header X-Total-Count.
+
+    Với `fuzzy=true`, hoặc khi không có kết quả chuỗi con nào (ví dụ gõ sai
+    "recieve"), tìm các từ cách từ khóa tối đa `max_distance` phép sửa;
+    header X-Search-Mode cho biết chế độ đã dùng.
+    """
+    skip = max(skip, 0)
+    limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+    max_distance = max(0, min(max_distance, MAX_EDIT_DISTANCE))
+    catalog.ensure_loaded(db)
+    mode = "substring"
+    total, word_ids = (0, []) if fuzzy else search_index.search(keyword, skip, limit)
+    if not total:
+        mode = "fuzzy"
+        matches = fuzzy_index.lookup(keyword, max_distance)
+        total = len(matches)
+        word_ids = [word_id for word_id, _ in matches[skip:skip + limit]]
     
-    if not vocabulary:
+    if not word_ids:
         raise HTTPException(status_code=404, detail="No vocabulary found")
     
-    # Save search history with the first result
-    if vocabulary and len(vocabulary) > 0:
-        search_history = models.SearchHistory(
-            user_id=current_user.user_id,
-            word_id=vocabulary[0].word_id
-        )
-        db.add(search_history)
-        db.commit()
+    rows = db.query(models.Vocabulary).filter(models.Vocabulary.word_id.in_(word_ids)).all()
+    by_id = {row.word_id: row for row in rows}
+    vocabulary = [by_id[word_id] for word_id in word_ids if word_id in by_id]
+    response.headers["X-Total-Count"] = str(total)
+    response.headers["X-Search-Mode"] = mode
+    
+    # Save search history with the first (best ranked) result (ghi nền theo lô, không commit trong request)
+    if vocabulary and skip == 0:
+        search_history_buffer.record(current_user.user_id, vocabulary[0].word_id)
     
     return vocabulary
 
+@router.get("/search/meaning", response_model=schemas.PaginatedVocabulary)
+def search_vocabulary_by_meaning(
+    query: str,
+    skip: int = 0,
+    limit: int = 20,
+    definition_weight: float = DEFAULT_WEIGHTS["definition"],
+    example_weight: float = DEFAULT_WEIGHTS["example"],
+    synonyms_weight: float = DEFAULT_WEIGHTS["synonyms"],
+    db: Session = Depends(get_read_db),
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
+):
+    """
+    Tìm từ theo nghĩa: xếp hạng BM25 trên definition, example và synonyms
+    (ví dụ "happy" tìm ra "cheerful" qua synonyms).
+
+    Trọng số từng field chỉnh được qua query; đặt 0 để bỏ qua field đó.
+    """
+    skip = max(skip, 0)
+    limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+    weights = {
+        "definition": max(definition_weight, 0.0),
+        "example": max(example_weight, 0.0),
+        "synonyms": max(synonyms_weight, 0.0),
+    }
+    catalog.ensure_loaded(db)
+    total, word_ids = fulltext_index.search(query, skip, limit, weights)
+    
+    items = []
+    if word_ids:
+        rows = db.query(models.Vocabulary).filter(models.Vocabulary.word_id.in_(word_ids)).all()
+        by_id = {row.word_id: row for row in rows}
+        items = [by_id[word_id] for word_id in word_ids if word_id in by_id]
+    
+    return {
+        "items": items,
+        "total": total,
+        "page": skip // limit + 1,
+        "pages": (total + limit - 1) // limit
+    }
+
+@router.get("/autocomplete", response_model=List[schemas.AutocompleteItem])
+def autocomplete_vocabulary(
+    prefix: str,
+    limit: int = 10,
+    db: Session = Depends(get_read_db),
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
+):
+    """
+    Gợi ý từ theo tiền tố cho thanh tìm kiếm, tra hoàn toàn trong bộ nhớ.
+
+    Không query DB (trừ lần đầu khi index chưa được nạp) và không ghi lịch sử tìm kiếm.
+    """
+    limit = max(1, min(limit, MAX_AUTOCOMPLETE_LIMIT))
+    catalog.ensure_loaded(db)
+    return [
+        {"word_id": word_id, "word": word}
+        for word_id, word in prefix_index.complete(prefix, limit)
+    ]
+
+@router.post("/batch", response_model=schemas.VocabularyBatch)
+def get_vocabulary_batch(
+    batch: schemas.VocabularyBatchRequest,
+    db: Session = Depends(get_read_db),
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
+):
+    """
+    Lấy chi tiết nhiều từ trong một request (tối đa 500 word_id), giữ thứ tự gửi lên.
+
+    Đọc qua cache dùng chung với GET /vocabulary/{word_id}; các từ chưa có
+    trong cache được nạp bằng một query IN. word_id không tồn tại trả về ở `missing`.
+    """
+    # Đồng bộ catalog trước để cache bỏ các từ admin vừa sửa/xóa ở worker khác
+    catalog.ensure_loaded(db)
+    found = vocabulary_cache.get_many(db, batch.word_ids)
+    word_ids = list(dict.fromkeys(batch.word_ids))
+    return {
+        "items": [found[word_id] for word_id in word_ids if word_id in found],
+        "missing": [word_id for word_id in word_ids if word_id not in found]
+    }
+
+@router.get("/snapshot")
+def get_vocabulary_snapshot(
+    request: Request,
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
+):
+    """
+    Tải toàn bộ catalog cho chế độ offline: NDJSON nén gzip, stream từng khối.
+
+    Dòng đầu là {"catalog_version": N}, các dòng sau là từng từ vựng. Phiên bản
+    cũng có trong header X-Catalog-Version/ETag; If-None-Match khớp thì trả 304.
+    Sau khi có snapshot, client chỉ cần gọi /vocabulary/changes?since=N.
+    Client không gửi Accept-Encoding: gzip thì nhận NDJSON không nén.
+    """
+    # Session riêng cho generator: sống đến khi stream xong, không phụ thuộc dependency.
+    # Phiên bản đọc bằng chính session này (cùng transaction với các dòng) và chỉ
+    # đọc một lần, dùng chung cho header, ETag và dòng đầu của body
+    snapshot_db = SessionLocal(info={"request": request, "read_only": True})
+    try:
+        version = catalog.latest_version(snapshot_db)
+    except Exception:
+        snapshot_db.close()
+        raise
+    etag = make_etag("snapshot", version)
+    if if_none_match(request, etag):
+        snapshot_db.close()
+        return not_modified(etag)
+    compress = accepts_gzip(request.headers.get("accept-encoding"))
+    rows = iter_snapshot(snapshot_db, version, compress)
+    response = StreamingResponse(rows, media_type="application/x-ndjson")
+    if compress:
+        response.headers["Content-Encoding"] = "gzip"
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["X-Catalog-Version"] = str(version)
+    set_etag(response, etag)
+    return response
+
+@router.get("/changes", response_model=schemas.VocabularyChanges)
+def get_vocabulary_changes(
+    since: int,
+    limit: int = 500,
+    db: Session = Depends(get_read_db),
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
+):
+    """
+    Đồng bộ tăng dần sau snapshot: các từ thay đổi kể từ phiên bản `since`.
+
+    Phiên bản là catalog_version của AdminVocabActions, cấp theo thứ tự commit
+    nên không có thay đổi nào commit muộn với phiên bản thấp hơn phiên bản client
+    đã nhận. Mỗi lần trả khoảng `limit` thao tác nhưng không cắt ngang một phiên
+    bản (ví dụ một lần import Excel); từ còn tồn tại trả về bản hiện tại trong
+    `upserts`, từ đã xóa chỉ trả word_id trong `deleted`. Client lưu `version`
+    rồi gọi lại với since=version cho đến khi has_more=false.
+    """
+    if since < 0:
+        raise HTTPException(status_code=400, detail="since must be >= 0")
+    limit = max(1, min(limit, MAX_CHANGES_LIMIT))
+    
+    version_column = models.AdminVocabAction.catalog_version
+    actions = db.query(version_column, models.AdminVocabAction.word_id).filter(
+        version_column > since
+    ).order_by(version_column).limit(limit + 1).all()
+    has_more = len(actions) > limit
+    if has_more:
+        # Chỉ trả các phiên bản trọn vẹn; một phiên bản lớn hơn `limit` thì trả nguyên phiên bản đó
+        cut = actions[limit].catalog_version
+        actions = [action for action in actions if action.catalog_version < cut]
+        if not actions:
+            actions = db.query(version_column, models.AdminVocabAction.word_id).filter(
+                version_column == cut
+            ).all()
+    
+    if not actions:
+        latest = catalog.latest_version(db)
+        if since > latest:
+            # Phiên bản của client không thuộc catalog này (ví dụ DB đã được khôi phục)
+            raise HTTPException(status_code=409, detail="Unknown catalog version, download a new snapshot")
+        return {"version": since, "upserts": [], "deleted": [], "has_more": False}
+    
+    word_ids = list(dict.fromkeys(word_id for _, word_id in actions if word_id is not None))
+    upserts = []
+    if word_ids:
+        upserts = db.query(models.Vocabulary).filter(models.Vocabulary.word_id.in_(word_ids)).order_by(
+            models.Vocabulary.word_id
+        ).all()
+    existing = {vocab.word_id for vocab in upserts}
+    
+    return {
+        "version": actions[-1].catalog_version,
+        "upserts": upserts,
+        "deleted": [word_id for word_id in word_ids if word_id not in existing],
+        "has_more": has_more
+    }
+
 @router.get("/{word_id}", response_model=schemas.Vocabulary)
 def get_vocabulary_by_id(
     word_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_active_user)
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
 ):
-    vocabulary = db.query(models.Vocabulary).filter(models.Vocabulary.word_id == word_id).first()
+    etag = make_etag("vocabulary", word_id, catalog.version(db))
+    if if_none_match(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    
+    vocabulary = vocabulary_cache.get_many(db, [word_id]).get(word_id)
     if vocabulary is None:
         raise HTTPException(status_code=404, detail="Vocabulary not found")
     return vocabulary
@@ -154,7 +434,7 @@ def get_vocabulary_by_id(
 def mark_vocabulary_learned(
     word_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(authentication.get_current_active_user)
+    current_user: schemas.Principal = Depends(authentication.get_current_principal)
 ):
     # Check if vocabulary exists
     vocabulary = db.query(models.Vocabulary).filter(models.Vocabulary.word_id == word_id).first()
@@ -177,6 +457,7 @@ def mark_vocabulary_learned(
             word_id=word_id
         )
         db.add(user_vocab)
+        user_stats.record(db, current_user.user_id, learned_levels=[vocabulary.level])
     
     db.commit()
     db.refresh(user_vocab)
@@ -46,9 +46,28 @@ class User(UserBase):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class PasswordUpdateResult(User):
+    """User sau khi đổi mật khẩu kèm cặp token mới (token cũ đã bị thu hồi)"""
+    access_token: str
+    refresh_token: str
+    token_type: str
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     username: Optional[str] = None
+    user_id: Optional[int] = None
+    role: Optional[UserRole] = None
+    token_version: Optional[int] = None
+
+class Principal(BaseModel):
+    """Danh tính lấy từ claims của token, dùng cho các route không cần cả User row"""
+    user_id: int
+    username: str
+    role: UserRole
 
 class UserLogin(BaseModel):
     username: str
@@ -169,6 +188,27 @@ class SearchResult(BaseModel):
     definition: str
     level: str
 
+class VocabularyBatchRequest(BaseModel):
+    word_ids: List[int] = Field(..., min_items=1, max_items=500)
+
+class VocabularyBatch(BaseModel):
+    """Kết quả lấy nhiều từ một lần, theo đúng thứ tự word_ids gửi lên"""
+    items: List[Vocabulary]
+    # word_id không tồn tại
+    missing: List[int] = []
+
+class VocabularyChanges(BaseModel):
+    """Thay đổi của catalog sau một phiên bản: từ thêm/sửa (bản hiện tại) và word_id đã xóa"""
+    version: int
+    upserts: List[Vocabulary]
+    deleted: List[int]
+    # Còn thay đổi sau `version`; gọi tiếp với since=version
+    has_more: bool
+
+class AutocompleteItem(BaseModel):
+    word_id: int
+    word: str
+
 class SearchHistory(BaseModel):
     search_id: int
     user_id: int
@@ -244,9 +284,12 @@ class ImportResult(BaseModel):
 class PaginatedVocabulary(BaseModel):
     """Schema cho kết quả từ vựng có phân trang"""
     items: List[Vocabulary]
-    total: int
-    page: int
-    pages: int
+    # None khi không đếm tổng (include_total=false) hoặc khi phân trang bằng cursor
+    total: Optional[int] = None
+    page: Optional[int] = None
+    pages: Optional[int] = None
+    # Cursor cho trang kế tiếp (keyset pagination); None nếu đã hết
+    next_cursor: Optional[str] = None
     
     class Config:
         orm_mode = True
@@ -257,6 +300,8 @@ class VocabularyStatistics(BaseModel):
     remaining_count: int
     level_distribution: Dict[str, int]
     topic_distribution: Dict[str, int]
+    # Số từ user đã học theo level
+    learned_level_distribution: Dict[str, int] = {}
     
     class Config:
         orm_mode = True
@@ -293,3 +338,46 @@ class QuizResult(BaseModel):
 
 class VocabularyPracticeQuiz(BaseModel):
     quiz_results: List[QuizResult]
+
+class PracticeSession(BaseModel):
+    """Phiên làm bài: đáp án được giữ (đã ký) trong session_token, không gửi cho client"""
+    session_token: str
+    total_questions: int
+    expires_at: datetime
+
+class PracticeQuestion(BaseModel):
+    word_id: int
+    word: str
+    pronunciation: Optional[str] = None
+    example: Optional[str] = None
+    level: str
+    topic: str
+    status: str
+    choices: List[str]
+
+class PracticeQuestionPage(BaseModel):
+    items: List[PracticeQuestion]
+    total: int
+    # skip cho trang kế tiếp; None nếu đã hết
+    next_skip: Optional[int] = None
+
+class PracticeAnswer(BaseModel):
+    word_id: int
+    selected_answer: int = Field(..., ge=0, le=3)
+
+class PracticeSubmission(BaseModel):
+    session_token: str
+    answers: List[PracticeAnswer]
+
+class PracticeGrade(BaseModel):
+    word_id: int
+    selected_answer: int
+    correct_answer: int
+    is_correct: bool
+
+class PracticeSubmissionResult(BaseModel):
+    results: List[PracticeGrade]
+    correct_count: int
+    total_questions: int
+    learned_words: List[int]
+    total_learned: int
@@ -0,0 +1,84 @@
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Tuple
+
+from .search_index import normalize
+
+
+class PrefixIndex:
+    """
+    Mảng đã sắp xếp các từ chuẩn hóa, tra tiền tố bằng bisect cho autocomplete.
+
+    Giữ hai mảng song song (từ chuẩn hóa, word_id) thay vì list tuple để tiết
+    kiệm bộ nhớ với catalog lớn; thêm/xóa là O(n) nhưng chỉ xảy ra khi admin sửa.
+    """
+
+    def __init__(self):
+        self._keys: List[str] = []
+        self._ids = array("I")
+        self._words: Dict[int, str] = {}
+        self._lock = threading.RLock()
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def load(self, items: Iterable[Tuple[int, str]]):
+        entries = sorted((normalize(word), word_id, word) for word_id, word in items)
+        keys = [key for key, _, _ in entries]
+        ids = array("I", (word_id for _, word_id, _ in entries))
+        words = {word_id: word for _, word_id, word in entries}
+        with self._lock:
+            self._keys, self._ids, self._words = keys, ids, words
+            self.loaded = True
+
+    def add(self, word_id: int, word: str):
+        with self._lock:
+            if self._words.get(word_id) == word:
+                return
+            self._remove_locked(word_id)
+            key = normalize(word)
+            position = bisect_left(self._keys, key)
+            # Cùng từ khóa thì xếp theo word_id cho ổn định
+            while position < len(self._keys) and self._keys[position] == key and self._ids[position] < word_id:
+                position += 1
+            self._keys.insert(position, key)
+            self._ids.insert(position, word_id)
+            self._words[word_id] = word
+
+    def remove(self, word_id: int):
+        with self._lock:
+            self._remove_locked(word_id)
+
+    def _remove_locked(self, word_id: int):
+        word = self._words.pop(word_id, None)
+        if word is None:
+            return
+        key = normalize(word)
+        position = bisect_left(self._keys, key)
+        while position < len(self._keys) and self._keys[position] == key:
+            if self._ids[position] == word_id:
+                del self._keys[position]
+                del self._ids[position]
+                return
+            position += 1
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Tuple[int, str]]:
+        """Trả về tối đa `limit` cặp (word_id, word) có tiền tố `prefix`, theo alphabet"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        results = []
+        with self._lock:
+            position = bisect_left(self._keys, prefix)
+            while position < len(self._keys) and len(results) < limit:
+                if not self._keys[position].startswith(prefix):
+                    break
+                word_id = self._ids[position]
+                results.append((word_id, self._words[word_id]))
+                position += 1
+        return results
+
+
+prefix_index = PrefixIndex()
@@ -0,0 +1,185 @@
+"""
+Đồng bộ các index trong bộ nhớ của catalog từ vựng với bảng Vocabulary.
+
+Route admin gọi `stamp` trước khi commit để gắn phiên bản mới cho các
+AdminVocabAction của transaction, rồi gọi `refresh` sau khi commit;
+`rebuild` nạp lại toàn bộ khi khởi động hoặc khi index chưa được nạp.
+
+Phiên bản catalog nằm ở bảng CatalogVersion (một dòng). `stamp` tăng nó bằng
+UPDATE ... SET version = version + 1; khóa dòng giữ tới khi commit nên các
+phiên bản được cấp đúng theo thứ tự commit: thấy phiên bản N nghĩa là mọi thay
+đổi có phiên bản <= N đã commit. (action_id không dùng được vì AUTO_INCREMENT
+cấp lúc INSERT: transaction dài như import Excel có thể commit sau khi worker
+khác đã vượt qua id của nó.) Mỗi worker đọc lại phiên bản từ primary tối đa mỗi
+CATALOG_VERSION_TTL_SECONDS; khi thấy phiên bản mới, các từ bị ảnh hưởng được
+nạp lại vào index.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable
+
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import SessionLocal, replica_engine
+from .search_index import search_index
+from .autocomplete import prefix_index
+from .fuzzy_index import fuzzy_index, BACKGROUND_BUILD_MIN_WORDS
+from .fulltext_index import fulltext_index, FIELDS as FULLTEXT_FIELDS
+from .facets import catalog_facets
+from .distractors import distractor_pool
+from .vocabulary_cache import vocabulary_cache
+
+CATALOG_VERSION_TTL_SECONDS = float(os.getenv("CATALOG_VERSION_TTL_SECONDS", "2"))
+
+_INDEXES = (search_index, prefix_index, fuzzy_index, fulltext_index, catalog_facets, distractor_pool)
+_rebuild_lock = threading.Lock()
+
+# Phiên bản mà các index đang phản ánh và thời điểm kiểm tra gần nhất
+_version = 0
+_checked_at = 0.0
+
+
+def _text_fields(vocab) -> dict:
+    return {field: getattr(vocab, field) for field in FULLTEXT_FIELDS}
+
+
+@contextmanager
+def _primary(db: Session):
+    """Session đọc từ primary: replica có thể trễ làm phiên bản (và ETag) bị cũ"""
+    if replica_engine is None or not db.info.get("read_only"):
+        yield db
+        return
+    primary = SessionLocal()
+    try:
+        yield primary
+    finally:
+        primary.close()
+
+
+def latest_version(db: Session) -> int:
+    """Đọc thẳng phiên bản catalog từ DB (không qua TTL)"""
+    return db.query(models.CatalogVersion.version).filter(models.CatalogVersion.id == 1).scalar() or 0
+
+
+def stamp(db: Session, actions: Iterable[models.AdminVocabAction]) -> int:
+    """
+    Tăng phiên bản catalog trong transaction hiện tại và gắn nó vào `actions`.
+
+    Gọi ngay trước commit: dòng CatalogVersion bị khóa từ lúc này tới khi
+    commit, nên các transaction ghi catalog nối tiếp nhau theo phiên bản.
+    """
+    updated = db.query(models.CatalogVersion).filter(models.CatalogVersion.id == 1).update(
+        {models.CatalogVersion.version: models.CatalogVersion.version + 1}, synchronize_session=False
+    )
+    if not updated:
+        # Database tạo bằng create_all (không qua migration 0004) chưa có dòng phiên bản
+        db.add(models.CatalogVersion(id=1, version=1))
+        db.flush()
+    version = latest_version(db)
+    for action in actions:
+        action.catalog_version = version
+    return version
+
+
+def rebuild(db: Session):
+    with _primary(db) as primary:
+        _rebuild(primary)
+
+
+def _rebuild(db: Session):
+    global _version, _checked_at
+    with _rebuild_lock:
+        # Đọc phiên bản trước khi nạp: thay đổi xảy ra trong lúc nạp sẽ được áp dụng lại ở lần sync sau
+        version = latest_version(db)
+        # Nạp theo word_id để bucket đáp án sai có cùng thứ tự ở mọi worker (rút theo seed của phiên)
+        rows = db.query(
+            models.Vocabulary.word_id,
+            models.Vocabulary.word,
+            models.Vocabulary.level,
+            models.Vocabulary.topic,
+            models.Vocabulary.part_of_speech,
+            *(getattr(models.Vocabulary, field) for field in FULLTEXT_FIELDS),
+        ).order_by(models.Vocabulary.word_id).all()
+        words = [(row.word_id, row.word) for row in rows]
+        search_index.load(words)
+        prefix_index.load(words)
+        if len(words) >= BACKGROUND_BUILD_MIN_WORDS:
+            fuzzy_index.load_in_background(words)
+        else:
+            fuzzy_index.load(words)
+        fulltext_index.load((row.word_id, _text_fields(row)) for row in rows)
+        catalog_facets.load((row.word_id, row.level, row.topic) for row in rows)
+        distractor_pool.load(
+            (row.word_id, row.definition, row.level, row.part_of_speech, row.topic) for row in rows
+        )
+        _version, _checked_at = version, time.monotonic()
+
+
+def _sync(db: Session):
+    """Áp dụng vào index các thao tác admin có phiên bản > phiên bản hiện tại"""
+    global _version, _checked_at
+    with _rebuild_lock:
+        latest = latest_version(db)
+        if latest > _version:
+            word_ids = {
+                word_id for (word_id,) in db.query(models.AdminVocabAction.word_id).filter(
+                    models.AdminVocabAction.catalog_version > _version,
+                    models.AdminVocabAction.catalog_version <= latest,
+                ).distinct()
+                if word_id is not None
+            }
+            existing = []
+            if word_ids:
+                existing = db.query(models.Vocabulary).filter(models.Vocabulary.word_id.in_(word_ids)).all()
+            for vocab in existing:
+                vocabulary_saved(vocab)
+            for word_id in word_ids - {vocab.word_id for vocab in existing}:
+                vocabulary_deleted(word_id)
+            _version = latest
+        _checked_at = time.monotonic()
+
+
+def ensure_loaded(db: Session, max_age: float = CATALOG_VERSION_TTL_SECONDS):
+    if not all(index.loaded for index in _INDEXES):
+        rebuild(db)
+    elif time.monotonic() - _checked_at >= max_age:
+        with _primary(db) as primary:
+            _sync(primary)
+
+
+def refresh(db: Session):
+    """
+    Gọi sau khi route admin commit: áp dụng ngay thay đổi vừa ghi (cùng mọi
+    thay đổi commit trước đó ở worker khác) và nâng phiên bản của worker này,
+    để ETag đổi ngay ở request kế tiếp.
+    """
+    ensure_loaded(db, max_age=0)
+
+
+def version(db: Session) -> int:
+    """Phiên bản catalog hiện tại; chỉ query DB khi chưa nạp hoặc hết TTL"""
+    ensure_loaded(db)
+    return _version
+
+
+def vocabulary_saved(vocab: models.Vocabulary):
+    search_index.add(vocab.word_id, vocab.word)
+    prefix_index.add(vocab.word_id, vocab.word)
+    fuzzy_index.add(vocab.word_id, vocab.word)
+    fulltext_index.add(vocab.word_id, _text_fields(vocab))
+    catalog_facets.add(vocab.word_id, vocab.level, vocab.topic)
+    distractor_pool.add(vocab.word_id, vocab.definition, vocab.level, vocab.part_of_speech, vocab.topic)
+    vocabulary_cache.invalidate(vocab.word_id)
+
+
+def vocabulary_deleted(word_id: int):
+    search_index.remove(word_id)
+    prefix_index.remove(word_id)
+    fuzzy_index.remove(word_id)
+    fulltext_index.remove(word_id)
+    catalog_facets.remove(word_id)
+    distractor_pool.remove(word_id)
+    vocabulary_cache.invalidate(word_id)
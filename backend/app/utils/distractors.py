@@ -0,0 +1,169 @@
+import random
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Số lần rút ngẫu nhiên tối đa cho mỗi đáp án sai trước khi bỏ cuộc
+# (catalog quá nhỏ hoặc toàn định nghĩa trùng nhau)
+MAX_ATTEMPTS_PER_PICK = 8
+# Bucket nhỏ hơn ngưỡng này (tính theo số đáp án cần) thì duyệt hết theo thứ tự ngẫu nhiên
+SMALL_BUCKET_FACTOR = 4
+
+
+def bucket_keys(level: Optional[str], part_of_speech: Optional[str], topic: Optional[str]) -> Tuple[tuple, ...]:
+    """
+    Các bucket của một từ, từ hẹp đến rộng: cùng level + từ loại + topic,
+    cùng level + từ loại, cùng từ loại, cùng level, rồi toàn bộ catalog.
+    """
+    return (
+        ("lpt", level, part_of_speech, topic),
+        ("lp", level, part_of_speech),
+        ("p", part_of_speech),
+        ("l", level),
+        (),
+    )
+
+
+class _Bucket:
+    """Tập word_id dạng list + vị trí, thêm/xóa O(1), chọn ngẫu nhiên O(1)"""
+
+    __slots__ = ("word_ids", "slots")
+
+    def __init__(self):
+        self.word_ids: List[int] = []
+        self.slots: Dict[int, int] = {}
+
+    def add(self, word_id: int):
+        if word_id not in self.slots:
+            self.slots[word_id] = len(self.word_ids)
+            self.word_ids.append(word_id)
+
+    def remove(self, word_id: int):
+        slot = self.slots.pop(word_id, None)
+        if slot is None:
+            return
+        last = self.word_ids.pop()
+        if slot < len(self.word_ids):
+            self.word_ids[slot] = last
+            self.slots[last] = slot
+
+
+class DistractorPool:
+    """
+    Kho định nghĩa của catalog dùng làm đáp án sai cho bài trắc nghiệm.
+
+    Mỗi từ nằm trong các bucket của `bucket_keys`; đáp án sai được rút từ
+    bucket hẹp nhất của từ cần hỏi (cùng level, từ loại, topic nên khó đoán
+    hơn) rồi mới mở rộng dần khi bucket không đủ định nghĩa phân biệt.
+
+    Bucket lớn: chọn vị trí ngẫu nhiên và loại lại nếu trùng đáp án đúng hoặc
+    đã chọn; bucket nhỏ: duyệt hết theo thứ tự ngẫu nhiên. Cả hai đều không
+    phụ thuộc kích thước catalog, và bucket được cập nhật tăng dần khi admin
+    sửa catalog nên không cần query DB cho từng câu hỏi.
+    """
+
+    def __init__(self):
+        self._definitions: Dict[int, str] = {}
+        self._keys: Dict[int, Tuple[tuple, ...]] = {}
+        self._buckets: Dict[tuple, _Bucket] = {}
+        self._lock = threading.RLock()
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._definitions)
+
+    def load(self, items: Iterable[Tuple[int, str, Optional[str], Optional[str], Optional[str]]]):
+        """Dựng lại từ (word_id, definition, level, part_of_speech, topic) rồi thay thế một lần"""
+        definitions, keys, buckets = {}, {}, {}
+        for word_id, definition, level, part_of_speech, topic in items:
+            definitions[word_id] = definition
+            keys[word_id] = bucket_keys(level, part_of_speech, topic)
+            for key in keys[word_id]:
+                bucket = buckets.get(key)
+                if bucket is None:
+                    bucket = buckets[key] = _Bucket()
+                bucket.add(word_id)
+        with self._lock:
+            self._definitions, self._keys, self._buckets = definitions, keys, buckets
+            self.loaded = True
+
+    def add(
+        self,
+        word_id: int,
+        definition: str,
+        level: Optional[str] = None,
+        part_of_speech: Optional[str] = None,
+        topic: Optional[str] = None,
+    ):
+        keys = bucket_keys(level, part_of_speech, topic)
+        with self._lock:
+            if self._keys.get(word_id) != keys:
+                self._remove_locked(word_id)
+                self._keys[word_id] = keys
+                for key in keys:
+                    bucket = self._buckets.get(key)
+                    if bucket is None:
+                        bucket = self._buckets[key] = _Bucket()
+                    bucket.add(word_id)
+            self._definitions[word_id] = definition
+
+    def remove(self, word_id: int):
+        with self._lock:
+            self._remove_locked(word_id)
+
+    def _remove_locked(self, word_id: int):
+        self._definitions.pop(word_id, None)
+        for key in self._keys.pop(word_id, ()):
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                continue
+            bucket.remove(word_id)
+            if not bucket.word_ids:
+                del self._buckets[key]
+
+    def sample(
+        self,
+        correct_definition: str,
+        k: int = 3,
+        level: Optional[str] = None,
+        part_of_speech: Optional[str] = None,
+        topic: Optional[str] = None,
+        rng: Optional[random.Random] = None,
+    ) -> List[str]:
+        """
+        Rút tối đa `k` định nghĩa khác nhau và khác `correct_definition`,
+        ưu tiên bucket gần với (level, part_of_speech, topic) nhất.
+
+        Có thể trả về ít hơn `k` nếu catalog không đủ định nghĩa phân biệt;
+        route tự bù phần thiếu.
+        """
+        rng = rng or random
+        picked: List[str] = []
+        with self._lock:
+            for key in bucket_keys(level, part_of_speech, topic):
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    self._sample_bucket(bucket.word_ids, correct_definition, k, picked, rng)
+                if len(picked) >= k:
+                    break
+        return picked
+
+    def _sample_bucket(self, word_ids: List[int], correct_definition: str, k: int, picked: List[str], rng):
+        def take(word_id: int):
+            definition = self._definitions[word_id]
+            if definition and definition != correct_definition and definition not in picked:
+                picked.append(definition)
+
+        size = len(word_ids)
+        if size <= k * SMALL_BUCKET_FACTOR:
+            for slot in rng.sample(range(size), size):
+                take(word_ids[slot])
+                if len(picked) >= k:
+                    return
+            return
+        attempts = k * MAX_ATTEMPTS_PER_PICK
+        while len(picked) < k and attempts > 0:
+            attempts -= 1
+            take(word_ids[rng.randrange(size)])
+
+
+distractor_pool = DistractorPool()
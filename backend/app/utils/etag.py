@@ -0,0 +1,29 @@
+from fastapi import Request, Response
+
+# Client phải hỏi lại server mỗi lần (có thể nhận 304); không cho cache dùng chung lưu vì cần token
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """ETag mạnh ghép từ các thành phần (ví dụ tên resource và phiên bản catalog)"""
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def if_none_match(request: Request, etag: str) -> bool:
+    """True nếu If-None-Match của request khớp `etag` (so sánh yếu, theo RFC 9110)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in header.split(","))
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in candidates)
+
+
+def set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
@@ -0,0 +1,79 @@
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class CatalogFacets:
+    """
+    Thống kê tổng hợp của catalog từ vựng (danh sách topic/level, phân bố
+    theo level/topic, tổng số từ), cập nhật tăng dần khi admin sửa catalog.
+
+    Giữ (level, topic) của từng word_id để khi cập nhật/xóa biết phải trừ
+    vào nhóm cũ nào mà không cần query lại.
+    """
+
+    def __init__(self):
+        self._entries: Dict[int, Tuple[Optional[str], Optional[str]]] = {}
+        self._levels: Counter = Counter()
+        self._topics: Counter = Counter()
+        self._lock = threading.RLock()
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def load(self, items: Iterable[Tuple[int, Optional[str], Optional[str]]]):
+        entries = {word_id: (level, topic) for word_id, level, topic in items}
+        levels = Counter(level for level, _ in entries.values())
+        topics = Counter(topic for _, topic in entries.values())
+        with self._lock:
+            self._entries, self._levels, self._topics = entries, levels, topics
+            self.loaded = True
+
+    def add(self, word_id: int, level: Optional[str], topic: Optional[str]):
+        with self._lock:
+            self._remove_locked(word_id)
+            self._entries[word_id] = (level, topic)
+            self._levels[level] += 1
+            self._topics[topic] += 1
+
+    def remove(self, word_id: int):
+        with self._lock:
+            self._remove_locked(word_id)
+
+    def _remove_locked(self, word_id: int):
+        entry = self._entries.pop(word_id, None)
+        if entry is None:
+            return
+        level, topic = entry
+        for counter, key in ((self._levels, level), (self._topics, topic)):
+            counter[key] -= 1
+            if counter[key] <= 0:
+                del counter[key]
+
+    def level(self, word_id: int) -> Optional[str]:
+        entry = self._entries.get(word_id)
+        return entry[0] if entry else None
+
+    @property
+    def total(self) -> int:
+        return len(self._entries)
+
+    def topics(self) -> List[str]:
+        with self._lock:
+            return sorted(topic for topic in self._topics if topic)
+
+    def levels(self) -> List[str]:
+        with self._lock:
+            return sorted(level for level in self._levels if level)
+
+    def level_distribution(self) -> Dict[str, int]:
+        with self._lock:
+            return {level: count for level, count in sorted(self._levels.items()) if level}
+
+    def topic_distribution(self) -> Dict[str, int]:
+        with self._lock:
+            return {topic: count for topic, count in sorted(self._topics.items()) if topic}
+
+
+catalog_facets = CatalogFacets()
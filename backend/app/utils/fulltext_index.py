@@ -0,0 +1,139 @@
+import heapq
+import math
+import re
+import sys
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+FIELDS = ("definition", "example", "synonyms")
+DEFAULT_WEIGHTS = {"definition": 1.0, "example": 0.5, "synonyms": 2.0}
+
+# Tham số BM25 chuẩn
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN.findall((text or "").lower())
+
+
+class FulltextIndex:
+    """
+    Inverted index BM25 trên definition, example và synonyms của Vocabulary.
+
+    Mỗi (field, term) có một posting là array('I') xen kẽ [doc_id, tf, doc_id, tf, ...]
+    để giữ bộ nhớ gọn với catalog lớn. Forward index (doc_id -> các term theo
+    field) cho phép xóa/cập nhật một từ mà không phải dựng lại toàn bộ.
+    Điểm của một từ là tổng BM25 của từng field nhân với trọng số field.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[str, array]] = {field: {} for field in FIELDS}
+        self._lengths: Dict[str, Dict[int, int]] = {field: {} for field in FIELDS}
+        self._total_length: Dict[str, int] = {field: 0 for field in FIELDS}
+        self._forward: Dict[int, Tuple[Tuple[str, ...], ...]] = {}
+        self._lock = threading.RLock()
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._forward)
+
+    def load(self, items: Iterable[Tuple[int, Mapping[str, Optional[str]]]]):
+        """Dựng lại toàn bộ index từ (word_id, {field: text}) rồi thay thế một lần"""
+        fresh = FulltextIndex()
+        for doc_id, fields in items:
+            fresh._add_locked(doc_id, fields)
+        with self._lock:
+            self._postings, self._lengths = fresh._postings, fresh._lengths
+            self._total_length, self._forward = fresh._total_length, fresh._forward
+            self.loaded = True
+
+    def add(self, doc_id: int, fields: Mapping[str, Optional[str]]):
+        with self._lock:
+            self._remove_locked(doc_id)
+            self._add_locked(doc_id, fields)
+
+    def remove(self, doc_id: int):
+        with self._lock:
+            self._remove_locked(doc_id)
+
+    def _add_locked(self, doc_id: int, fields: Mapping[str, Optional[str]]):
+        forward = []
+        for field in FIELDS:
+            tokens = tokenize(fields.get(field))
+            counts = Counter(tokens)
+            postings = self._postings[field]
+            for term, tf in counts.items():
+                posting = postings.get(term)
+                if posting is None:
+                    postings[sys.intern(term)] = array("I", (doc_id, tf))
+                else:
+                    posting.append(doc_id)
+                    posting.append(tf)
+            if tokens:
+                self._lengths[field][doc_id] = len(tokens)
+                self._total_length[field] += len(tokens)
+            # intern để forward index dùng chung chuỗi với key của posting
+            forward.append(tuple(sys.intern(term) for term in counts))
+        self._forward[doc_id] = tuple(forward)
+
+    def _remove_locked(self, doc_id: int):
+        forward = self._forward.pop(doc_id, None)
+        if forward is None:
+            return
+        for field, terms in zip(FIELDS, forward):
+            postings = self._postings[field]
+            for term in terms:
+                posting = postings.get(term)
+                if posting is None:
+                    continue
+                # doc_id nằm ở vị trí chẵn; tf ở vị trí lẻ có thể trùng giá trị doc_id
+                for position in range(0, len(posting), 2):
+                    if posting[position] == doc_id:
+                        del posting[position:position + 2]
+                        break
+                if not posting:
+                    del postings[term]
+            self._total_length[field] -= self._lengths[field].pop(doc_id, 0)
+
+    def search(
+        self,
+        query: str,
+        skip: int = 0,
+        limit: int = 20,
+        weights: Optional[Mapping[str, float]] = None,
+    ) -> Tuple[int, List[int]]:
+        """Trả về (tổng số kết quả, word_id của trang hiện tại) theo điểm BM25 giảm dần"""
+        terms = set(tokenize(query))
+        if not terms:
+            return 0, []
+        weights = weights or DEFAULT_WEIGHTS
+        scores: Dict[int, float] = {}
+        with self._lock:
+            doc_count = len(self._forward)
+            for field in FIELDS:
+                weight = weights.get(field, 0.0)
+                lengths = self._lengths[field]
+                if weight <= 0 or not lengths:
+                    continue
+                average_length = self._total_length[field] / len(lengths)
+                for term in terms:
+                    posting = self._postings[field].get(term)
+                    if posting is None:
+                        continue
+                    df = len(posting) // 2
+                    idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+                    for position in range(0, len(posting), 2):
+                        doc_id, tf = posting[position], posting[position + 1]
+                        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc_id] / average_length)
+                        score = weight * idf * tf * (BM25_K1 + 1) / (tf + norm)
+                        scores[doc_id] = scores.get(doc_id, 0.0) + score
+        page = heapq.nsmallest(skip + limit, scores.items(), key=lambda item: (-item[1], item[0]))[skip:]
+        return len(scores), [doc_id for doc_id, _ in page]
+
+
+fulltext_index = FulltextIndex()
@@ -0,0 +1,266 @@
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .search_index import normalize
+
+logger = logging.getLogger("stulang.fuzzy_index")
+
+MAX_EDIT_DISTANCE = 2
+# Chỉ sinh deletes trên tiền tố này của từ (như SymSpell) để giới hạn bộ nhớ:
+# 6 ký tự cho 22 deletes mỗi từ (7 ký tự là 29) và bảng nhỏ hơn khoảng 2 lần
+PREFIX_LENGTH = 6
+# Catalog từ chừng này từ trở lên thì index được xây ở thread nền (mất vài giây
+# mỗi 100k từ) để không chặn lúc worker khởi động
+BACKGROUND_BUILD_MIN_WORDS = 50_000
+
+
+def _deletes(text: str, distance: int) -> Set[str]:
+    """Mọi chuỗi thu được khi xóa tối đa `distance` ký tự khỏi `text` (kể cả chính nó)"""
+    results = {text}
+    frontier = {text}
+    for _ in range(distance):
+        next_frontier = set()
+        for item in frontier:
+            for i in range(len(item)):
+                next_frontier.add(item[:i] + item[i + 1:])
+        next_frontier -= results
+        results |= next_frontier
+        frontier = next_frontier
+    return results
+
+
+def _letters(text: str) -> int:
+    """Bitmask các ký tự có trong `text` (ký tự khác nhau có thể trùng bit)"""
+    mask = 0
+    for char in text:
+        mask |= 1 << (ord(char) & 63)
+    return mask
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Khoảng cách Damerau-Levenshtein (optimal string alignment), dừng sớm khi
+    chắc chắn vượt `max_distance` và khi đó trả về max_distance + 1.
+
+    Bỏ phần đầu/cuối chung của hai chuỗi rồi chỉ tính dải |i - j| <= max_distance
+    của bảng quy hoạch động (ô ngoài dải chắc chắn vượt ngưỡng).
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    start = 0
+    shortest = min(len(a), len(b))
+    while start < shortest and a[start] == b[start]:
+        start += 1
+    end_a, end_b = len(a), len(b)
+    while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    a, b = a[start:end_a], b[start:end_b]
+    too_far = max_distance + 1
+    if not a or not b:
+        return min(len(a) + len(b), too_far)
+    previous2 = None
+    previous = [j if j <= max_distance else too_far for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [too_far] * (len(b) + 1)
+        current[0] = i if i <= max_distance else too_far
+        row_min = current[0]
+        char = a[i - 1]
+        for j in range(max(1, i - max_distance), min(len(b), i + max_distance) + 1):
+            value = previous[j - 1] if char == b[j - 1] else previous[j - 1] + 1
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if previous2 is not None and j > 1 and char == b[j - 2] and a[i - 2] == b[j - 1] \
+                    and previous2[j - 2] + 1 < value:
+                value = previous2[j - 2] + 1
+            if value > too_far:
+                value = too_far
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > max_distance:
+            return too_far
+        previous2, previous = previous, current
+    return min(previous[-1], too_far)
+
+
+class FuzzyIndex:
+    """
+    Index kiểu SymSpell cho tìm từ gần đúng (gõ sai chính tả) trên Vocabulary.word.
+
+    Mỗi từ được đăng ký dưới mọi "delete" (xóa tối đa MAX_EDIT_DISTANCE ký tự)
+    của tiền tố PREFIX_LENGTH ký tự. Khi tra, sinh deletes của từ khóa, lấy các
+    từ dùng chung delete rồi kiểm tra lại bằng edit distance thật.
+
+    Giá trị trong bảng delete là int khi chỉ có một từ (trường hợp phổ biến)
+    và tuple khi nhiều hơn, để tránh tốn bộ nhớ cho hàng triệu set nhỏ.
+
+    `load_in_background` xây bảng ở thread riêng; add/remove trong lúc đó được
+    ghi lại và áp dụng vào bảng mới trước khi thay thế. Trong lúc xây, lookup
+    trả lời từ bảng cũ (rỗng nếu là lần nạp đầu).
+    """
+
+    def __init__(self, max_distance: int = MAX_EDIT_DISTANCE, prefix_length: int = PREFIX_LENGTH):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self._words: Dict[int, str] = {}
+        self._deletes: Dict[str, object] = {}
+        self._lock = threading.RLock()
+        # (word_id, word hoặc None nếu xóa) nhận được trong lúc đang xây bảng mới
+        self._pending: Optional[List[Tuple[int, Optional[str]]]] = None
+        self._builder: Optional[threading.Thread] = None
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def _keys(self, text: str) -> Set[str]:
+        return _deletes(text[:self.prefix_length], self.max_distance)
+
+    @staticmethod
+    def _link(table: Dict[str, object], key: str, word_id: int):
+        current = table.get(key)
+        if current is None:
+            table[key] = word_id
+        elif isinstance(current, int):
+            if current != word_id:
+                table[key] = (current, word_id)
+        elif word_id not in current:
+            table[key] = current + (word_id,)
+
+    def _unlink(self, key: str, word_id: int):
+        current = self._deletes.get(key)
+        if current is None:
+            return
+        if isinstance(current, int):
+            if current == word_id:
+                del self._deletes[key]
+            return
+        remaining = tuple(item for item in current if item != word_id)
+        self._deletes[key] = remaining[0] if len(remaining) == 1 else remaining
+
+    @property
+    def building(self) -> bool:
+        return self._builder is not None and self._builder.is_alive()
+
+    def _build(self, items: Iterable[Tuple[int, str]]):
+        words, table = {}, {}
+        for word_id, word in items:
+            text = normalize(word)
+            words[word_id] = text
+            for key in self._keys(text):
+                self._link(table, key, word_id)
+        return words, table
+
+    def _begin_load(self):
+        with self._lock:
+            self._pending = []
+
+    def _finish_load(self, words, table):
+        with self._lock:
+            self._words, self._deletes = words, table
+            pending, self._pending = self._pending or [], None
+            for word_id, word in pending:
+                if word is None:
+                    self._remove_locked(word_id)
+                else:
+                    self._add_locked(word_id, word)
+            self.loaded = True
+
+    def load(self, items: Iterable[Tuple[int, str]]):
+        self.wait()
+        self._begin_load()
+        self._finish_load(*self._build(items))
+
+    def load_in_background(self, items: Iterable[Tuple[int, str]]):
+        """Như `load` nhưng xây bảng ở thread nền; index nhận add/remove ngay"""
+        self.wait()
+        items = list(items)
+        self._begin_load()
+        self.loaded = True
+        self._builder = threading.Thread(
+            target=self._build_in_background, args=(items,), name="fuzzy-index-build", daemon=True
+        )
+        self._builder.start()
+
+    def _build_in_background(self, items: List[Tuple[int, str]]):
+        try:
+            self._finish_load(*self._build(items))
+        except Exception:
+            logger.exception("Building fuzzy index failed")
+            with self._lock:
+                self._pending = None
+                self.loaded = False
+
+    def wait(self, timeout: Optional[float] = None):
+        """Chờ lần xây nền (nếu có) xong"""
+        builder = self._builder
+        if builder is not None:
+            builder.join(timeout)
+
+    def add(self, word_id: int, word: str):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((word_id, word))
+            self._add_locked(word_id, word)
+
+    def _add_locked(self, word_id: int, word: str):
+        text = normalize(word)
+        if self._words.get(word_id) == text:
+            return
+        self._remove_locked(word_id)
+        self._words[word_id] = text
+        for key in self._keys(text):
+            self._link(self._deletes, key, word_id)
+
+    def remove(self, word_id: int):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((word_id, None))
+            self._remove_locked(word_id)
+
+    def _remove_locked(self, word_id: int):
+        text = self._words.pop(word_id, None)
+        if text is None:
+            return
+        for key in self._keys(text):
+            self._unlink(key, word_id)
+
+    def lookup(self, keyword: str, max_distance: int = MAX_EDIT_DISTANCE) -> List[Tuple[int, int]]:
+        """
+        Trả về mọi cặp (word_id, distance) trong phạm vi `max_distance`,
+        xếp theo khoảng cách rồi theo alphabet.
+        """
+        keyword = normalize(keyword)
+        max_distance = min(max_distance, self.max_distance)
+        if not keyword:
+            return []
+        matches = []
+        keyword_letters = _letters(keyword)
+        with self._lock:
+            seen = set()
+            for key in _deletes(keyword[:self.prefix_length], max_distance):
+                entry = self._deletes.get(key)
+                if entry is None:
+                    continue
+                for word_id in ((entry,) if isinstance(entry, int) else entry):
+                    if word_id in seen:
+                        continue
+                    seen.add(word_id)
+                    text = self._words[word_id]
+                    # Mỗi phép sửa thêm/bớt tối đa một ký tự khác biệt ở mỗi phía
+                    letters = _letters(text)
+                    if (letters & ~keyword_letters).bit_count() > max_distance \
+                            or (keyword_letters & ~letters).bit_count() > max_distance:
+                        continue
+                    distance = edit_distance(keyword, text, max_distance)
+                    if distance <= max_distance:
+                        matches.append((distance, text, word_id))
+        matches.sort()
+        return [(word_id, distance) for distance, _, word_id in matches]
+
+
+fuzzy_index = FuzzyIndex()
@@ -0,0 +1,25 @@
+import base64
+import json
+from typing import Any, Tuple
+
+
+def encode_cursor(sort_by: str, sort_order: str, value: Any, word_id: int) -> str:
+    """Cursor mờ cho keyset pagination: vị trí (giá trị cột sắp xếp, word_id) của dòng cuối trang"""
+    payload = json.dumps([sort_by, sort_order, value, word_id], separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, sort_order: str) -> Tuple[Any, int]:
+    """
+    Giải mã cursor thành (giá trị cột sắp xếp, word_id).
+
+    Raise ValueError nếu cursor hỏng hoặc được tạo với cách sắp xếp khác.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort_by, cursor_order, value, word_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if (cursor_sort_by, cursor_order) != (sort_by, sort_order) or not isinstance(word_id, int):
+        raise ValueError("Cursor does not match sort_by/sort_order")
+    return value, word_id
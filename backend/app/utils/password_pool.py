@@ -0,0 +1,79 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# bcrypt nhả GIL khi băm nên thread pool là đủ, không cần process pool
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# Số job tối đa được phép chờ; vượt quá thì từ chối ngay thay vì xếp hàng
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+
+
+class PasswordPoolBusy(Exception):
+    """Hàng đợi băm mật khẩu đã đầy"""
+
+
+class PasswordPool:
+    """
+    Thread pool riêng, có giới hạn, cho bcrypt hash/verify.
+
+    Giữ bcrypt ra khỏi event loop và khỏi threadpool mặc định của Starlette,
+    nên một đợt đăng nhập dồn dập không làm nghẽn các request khác.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight_seen = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self.in_flight - self.workers)
+
+    def _acquire(self):
+        with self._lock:
+            if self.in_flight - self.workers >= self.max_queue:
+                self.rejected += 1
+                raise PasswordPoolBusy()
+            self.in_flight += 1
+            self.max_in_flight_seen = max(self.max_in_flight_seen, self.in_flight)
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+
+    async def run(self, func: Callable, *args):
+        self._acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self._release()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "queue_depth": self.queue_depth,
+                "max_in_flight_seen": self.max_in_flight_seen,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+
+password_pool = PasswordPool()
@@ -0,0 +1,82 @@
+import contextvars
+import re
+import time
+from collections import Counter
+from typing import Optional
+from sqlalchemy import event
+
+_NUMBER = re.compile(r"\b\d+\b")
+_IN_LIST = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))*\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Chuẩn hóa câu SQL để gom các câu chỉ khác tham số (IN (?, ?, ...) -> IN (...))"""
+    shape = _IN_LIST.sub("(...)", statement)
+    shape = _NUMBER.sub("N", shape)
+    return _SPACES.sub(" ", shape).strip()
+
+
+class RequestQueryStats:
+    """Số câu query và tổng thời gian DB của một request"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.total_time += elapsed
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated_shapes(self, threshold: int):
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+_current: contextvars.ContextVar[Optional[RequestQueryStats]] = contextvars.ContextVar(
+    "request_query_stats", default=None
+)
+
+
+def start_request() -> contextvars.Token:
+    return _current.set(RequestQueryStats())
+
+
+def end_request(token: contextvars.Token) -> Optional[RequestQueryStats]:
+    stats = _current.get()
+    _current.reset(token)
+    return stats
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    stats.record(statement, time.perf_counter() - starts.pop())
+
+
+def _handle_error(exception_context):
+    # Câu lệnh lỗi không tới after_cursor_execute: bỏ mốc thời gian của nó để
+    # các câu sau trên cùng connection (trong pool) không bị lệch thời gian
+    conn = exception_context.connection
+    if _current.get() is None or conn is None:
+        return
+    starts = conn.info.get("query_start")
+    if starts:
+        starts.pop()
+
+
+def instrument(engine):
+    """Gắn bộ đếm vào engine (với AsyncEngine thì truyền engine.sync_engine)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
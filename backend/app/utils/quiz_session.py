@@ -0,0 +1,186 @@
+"""
+Phiên làm bài trắc nghiệm không lưu trạng thái ở server.
+
+Token phiên gồm user_id, hạn dùng, một seed ngẫu nhiên và danh sách word_id
+(sắp xếp, mã hóa delta + varint rồi nén zlib), ký HMAC-SHA256 bằng SECRET_KEY.
+Đáp án đúng của từng câu không nằm trong token mà được suy ra từ
+HMAC(seed, word_id), nên client không đọc được đáp án và server chấm bài chỉ
+với token, không cần query lại Vocabulary hay giữ phiên trong bộ nhớ. Phiên chỉ
+được nộp một lần: `consume` ghi seed vào bảng UsedQuizSessions.
+"""
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import random
+import secrets
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import List, NamedTuple, Tuple
+from dotenv import load_dotenv
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..authentication import SECRET_KEY
+from ..database import SessionLocal
+
+load_dotenv()
+
+logger = logging.getLogger("stulang.quiz_session")
+
+# Thời gian sống của một phiên làm bài
+QUIZ_SESSION_TTL_SECONDS = int(os.getenv("QUIZ_SESSION_TTL_SECONDS", "3600"))
+# Bật lại các endpoint cũ /cycles/practice-set (trả đáp án cho client) và
+# /cycles/practice-results (tin is_correct do client gửi) cho client chưa cập nhật
+ALLOW_CLIENT_GRADED_PRACTICE = os.getenv("ALLOW_CLIENT_GRADED_PRACTICE", "false").lower() == "true"
+CHOICES_PER_QUESTION = 4
+
+_VERSION = 1
+_HEADER = struct.Struct(">BIIQ")  # version, user_id, expires_at, seed
+_SIGNATURE_SIZE = 16
+_KEY = hashlib.sha256(b"quiz-session:" + SECRET_KEY.encode()).digest()
+
+# Lần dọn UsedQuizSessions gần nhất của worker này
+_purged_at = time.monotonic()
+_purge_lock = threading.Lock()
+
+
+class QuizSession(NamedTuple):
+    user_id: int
+    expires_at: int
+    seed: int
+    # Thứ tự câu hỏi (đã xáo trộn theo seed)
+    word_ids: List[int]
+
+
+def _encode_ids(word_ids: List[int]) -> bytes:
+    out = bytearray()
+    previous = 0
+    for word_id in sorted(word_ids):
+        delta = word_id - previous
+        previous = word_id
+        while delta >= 0x80:
+            out.append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        out.append(delta)
+    return zlib.compress(bytes(out), 9)
+
+
+def _decode_ids(data: bytes) -> List[int]:
+    word_ids, value, shift, previous = [], 0, 0, 0
+    for byte in zlib.decompress(data):
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        previous += value
+        word_ids.append(previous)
+        value, shift = 0, 0
+    return word_ids
+
+
+def _order(word_ids: List[int], seed: int) -> List[int]:
+    ordered = sorted(word_ids)
+    random.Random(seed).shuffle(ordered)
+    return ordered
+
+
+def _sign(body: bytes) -> bytes:
+    return hmac.new(_KEY, body, hashlib.sha256).digest()[:_SIGNATURE_SIZE]
+
+
+def issue(user_id: int, word_ids: List[int]) -> Tuple[str, QuizSession]:
+    """Tạo token cho một phiên gồm các từ `word_ids`; thứ tự câu hỏi được xáo trộn"""
+    seed = secrets.randbits(64)
+    expires_at = int(time.time()) + QUIZ_SESSION_TTL_SECONDS
+    body = _HEADER.pack(_VERSION, user_id, expires_at, seed) + _encode_ids(word_ids)
+    token = base64.urlsafe_b64encode(body + _sign(body)).decode().rstrip("=")
+    return token, QuizSession(user_id, expires_at, seed, _order(word_ids, seed))
+
+
+def open_session(token: str, user_id: int) -> QuizSession:
+    """
+    Kiểm tra chữ ký, chủ sở hữu và hạn dùng của token rồi giải mã.
+
+    Raise ValueError nếu token hỏng, bị sửa, của user khác hoặc đã hết hạn.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid quiz session")
+    body, signature = raw[:-_SIGNATURE_SIZE], raw[-_SIGNATURE_SIZE:]
+    if len(body) < _HEADER.size or not hmac.compare_digest(signature, _sign(body)):
+        raise ValueError("Invalid quiz session")
+    version, owner, expires_at, seed = _HEADER.unpack_from(body)
+    if version != _VERSION or owner != user_id:
+        raise ValueError("Invalid quiz session")
+    if expires_at < time.time():
+        raise ValueError("Quiz session expired")
+    try:
+        word_ids = _decode_ids(body[_HEADER.size:])
+    except zlib.error:
+        raise ValueError("Invalid quiz session")
+    return QuizSession(owner, expires_at, seed, _order(word_ids, seed))
+
+
+def correct_index(session: QuizSession, word_id: int) -> int:
+    """Vị trí của đáp án đúng trong danh sách lựa chọn của câu hỏi `word_id`"""
+    digest = hmac.new(_KEY, struct.pack(">QI", session.seed, word_id), hashlib.sha256).digest()
+    return digest[0] % CHOICES_PER_QUESTION
+
+
+def question_rng(session: QuizSession, word_id: int) -> random.Random:
+    """
+    Nguồn ngẫu nhiên cố định cho câu hỏi `word_id` của phiên, dùng để rút đáp án sai.
+
+    Tải lại cùng một trang phải ra cùng các lựa chọn; nếu đáp án sai đổi mỗi
+    lần tải thì lựa chọn duy nhất không đổi chính là đáp án đúng.
+    """
+    digest = hmac.new(_KEY, b"distractors:" + struct.pack(">QI", session.seed, word_id), hashlib.sha256).digest()
+    return random.Random(digest)
+
+
+def consume(db: Session, session: QuizSession) -> bool:
+    """
+    Đánh dấu phiên đã nộp trong transaction hiện tại của `db`; route tự commit.
+
+    Trả về False nếu phiên đã được nộp trước đó (ở worker này hay worker khác).
+    Mỗi QUIZ_SESSION_TTL_SECONDS, worker dọn các dòng đã hết hạn trước khi ghi.
+    """
+    _purge_if_due()
+    try:
+        with db.begin_nested():
+            db.add(models.UsedQuizSession(
+                session_id=f"{session.seed:016x}",
+                user_id=session.user_id,
+                expires_at=datetime.utcfromtimestamp(session.expires_at),
+            ))
+    except IntegrityError:
+        return False
+    return True
+
+
+def _purge_if_due():
+    """Dọn bảng trong transaction riêng, ngắn (trước khi transaction của route ghi gì)"""
+    global _purged_at
+    if time.monotonic() - _purged_at < QUIZ_SESSION_TTL_SECONDS or not _purge_lock.acquire(blocking=False):
+        return
+    try:
+        _purged_at = time.monotonic()
+        with SessionLocal() as db:
+            purge_used(db)
+    except Exception:
+        logger.exception("Purging used quiz sessions failed")
+    finally:
+        _purge_lock.release()
+
+
+def purge_used(db: Session):
+    """Xóa các phiên đã nộp và đã hết hạn (token hết hạn thì bị từ chối ở open_session)"""
+    db.query(models.UsedQuizSession).filter(models.UsedQuizSession.expires_at <= datetime.utcnow()).delete()
+    db.commit()
@@ -0,0 +1,44 @@
+"""
+Mốc read-your-writes đi kèm client.
+
+Sau khi user commit thay đổi, response mang header X-Read-Your-Writes gồm
+user_id và thời điểm hết hạn, ký HMAC bằng SECRET_KEY. Client gửi lại header
+này ở các request sau, nên worker nào nhận request (không chỉ worker đã xử lý
+lần ghi) cũng biết phải đọc từ primary cho đến khi mốc hết hạn.
+"""
+import hashlib
+import hmac
+import time
+from typing import Optional, Tuple
+
+from ..authentication import SECRET_KEY
+
+HEADER = "X-Read-Your-Writes"
+_SIGNATURE_SIZE = 16
+_KEY = hashlib.sha256(b"read-your-writes:" + SECRET_KEY.encode()).digest()
+
+
+def _sign(body: str) -> str:
+    return hmac.new(_KEY, body.encode(), hashlib.sha256).hexdigest()[:_SIGNATURE_SIZE * 2]
+
+
+def issue(user_id: int, until: float) -> str:
+    """Giá trị header cho user vừa ghi; hiệu lực đến `until` (epoch giây)"""
+    body = f"{user_id}.{int(until) + 1}"
+    return f"{body}.{_sign(body)}"
+
+
+def parse(value: Optional[str]) -> Optional[Tuple[int, float]]:
+    """(user_id, until) nếu header hợp lệ và chưa hết hạn, ngược lại None"""
+    if not value:
+        return None
+    body, _, signature = value.rpartition(".")
+    if not hmac.compare_digest(signature, _sign(body)):
+        return None
+    try:
+        user_id, until = (int(part) for part in body.split("."))
+    except ValueError:
+        return None
+    if until < time.time():
+        return None
+    return user_id, until
@@ -0,0 +1,152 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional
+from dotenv import load_dotenv
+from sqlalchemy import insert
+
+from .. import models
+
+load_dotenv()
+
+logger = logging.getLogger("stulang.search_history")
+
+# Số sự kiện tối đa giữ trong bộ nhớ; đầy thì bỏ sự kiện mới (đếm vào dropped)
+SEARCH_HISTORY_BUFFER_SIZE = int(os.getenv("SEARCH_HISTORY_BUFFER_SIZE", "10000"))
+# Ghi khi đủ số dòng này hoặc sau mỗi khoảng thời gian này, tùy điều kiện nào đến trước
+SEARCH_HISTORY_BATCH_SIZE = int(os.getenv("SEARCH_HISTORY_BATCH_SIZE", "500"))
+SEARCH_HISTORY_FLUSH_MS = int(os.getenv("SEARCH_HISTORY_FLUSH_MS", "1000"))
+
+
+class SearchHistoryBuffer:
+    """
+    Ghi lịch sử tìm kiếm theo kiểu write-behind.
+
+    Request chỉ đẩy (user_id, word_id, thời điểm) vào hàng đợi trong bộ nhớ;
+    một thread nền gom tối đa `batch_size` dòng và ghi bằng một câu INSERT
+    nhiều dòng. Sự kiện có thể mất nếu process bị kill đột ngột; khi tắt
+    bình thường, `stop` ghi nốt những gì còn trong hàng đợi.
+    """
+
+    def __init__(
+        self,
+        max_size: int = SEARCH_HISTORY_BUFFER_SIZE,
+        batch_size: int = SEARCH_HISTORY_BATCH_SIZE,
+        flush_interval_ms: int = SEARCH_HISTORY_FLUSH_MS,
+    ):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._engine = None
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+        self.max_depth_seen = 0
+        self.last_flush_ms = 0.0
+
+    def record(self, user_id: int, word_id: int):
+        with self._lock:
+            if len(self._queue) >= self.max_size:
+                self.dropped += 1
+                return
+            self._queue.append({"user_id": user_id, "word_id": word_id, "searched_at": datetime.now()})
+            self.enqueued += 1
+            depth = len(self._queue)
+            self.max_depth_seen = max(self.max_depth_seen, depth)
+        if depth >= self.batch_size:
+            self._wakeup.set()
+
+    def start(self, engine):
+        self._engine = engine
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="search-history-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        """Dừng thread nền rồi ghi hết hàng đợi"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        while self.flush():
+            pass
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            # Hàng đợi đang dồn thì ghi liên tục thay vì chờ hết chu kỳ
+            while self.flush() >= self.batch_size and not self._stopping.is_set():
+                pass
+
+    def flush(self) -> int:
+        """Ghi một lô (tối đa batch_size dòng); trả về số dòng đã lấy ra khỏi hàng đợi"""
+        if self._engine is None:
+            return 0
+        with self._flush_lock:
+            with self._lock:
+                count = min(len(self._queue), self.batch_size)
+                rows = [self._queue.popleft() for _ in range(count)]
+            if not rows:
+                return 0
+            start = time.perf_counter()
+            try:
+                with self._engine.begin() as conn:
+                    conn.execute(insert(models.SearchHistory).values(rows))
+            except Exception:
+                # Một dòng lỗi (ví dụ từ/user vừa bị xóa) không được kéo cả lô theo:
+                # ghi lại từng dòng, chỉ bỏ những dòng vẫn lỗi
+                logger.warning("Batch insert of %d search history rows failed, retrying row by row", len(rows))
+                self._write_rows_individually(rows)
+            else:
+                self.written += len(rows)
+            self.flushes += 1
+            self.last_flush_ms = (time.perf_counter() - start) * 1000
+            return len(rows)
+
+    def _write_rows_individually(self, rows):
+        with self._engine.connect() as conn:
+            for row in rows:
+                try:
+                    with conn.begin():
+                        conn.execute(insert(models.SearchHistory).values(row))
+                except Exception as exc:
+                    logger.warning("Dropped search history row %s: %s", row, exc)
+                    self.failed += 1
+                else:
+                    self.written += 1
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> Dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "max_size": self.max_size,
+            "max_depth_seen": self.max_depth_seen,
+            "batch_size": self.batch_size,
+            "flush_interval_ms": int(self.flush_interval * 1000),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "running": self._thread is not None and self._thread.is_alive(),
+        }
+
+
+search_history_buffer = SearchHistoryBuffer()
@@ -0,0 +1,127 @@
+import heapq
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+GRAM_SIZE = 3
+
+
+def normalize(word: str) -> str:
+    return (word or "").strip().lower()
+
+
+def _grams(text: str) -> Set[str]:
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+class TrigramIndex:
+    """
+    Index trigram trong bộ nhớ cho Vocabulary.word, dùng cho tìm kiếm chuỗi con.
+
+    Từ khóa >= 3 ký tự: giao các posting list trigram rồi kiểm tra lại bằng `in`.
+    Từ khóa 1-2 ký tự: hợp các posting của những trigram chứa từ khóa (mọi lần
+    xuất hiện của từ khóa trong một từ dài >= 3 đều nằm trong một trigram của từ đó).
+    Từ ngắn hơn 3 ký tự được giữ riêng và duyệt thẳng.
+    """
+
+    def __init__(self):
+        self._words: Dict[int, str] = {}
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        self._short_words: Set[int] = set()
+        self._lock = threading.RLock()
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def load(self, items: Iterable[Tuple[int, str]]):
+        """Dựng lại toàn bộ index từ (word_id, word) rồi thay thế một lần"""
+        words, postings, short_words = {}, defaultdict(set), set()
+        for word_id, word in items:
+            text = normalize(word)
+            words[word_id] = text
+            if len(text) < GRAM_SIZE:
+                short_words.add(word_id)
+            for gram in _grams(text):
+                postings[gram].add(word_id)
+        with self._lock:
+            self._words, self._postings, self._short_words = words, postings, short_words
+            self.loaded = True
+
+    def add(self, word_id: int, word: str):
+        text = normalize(word)
+        with self._lock:
+            if word_id in self._words:
+                if self._words[word_id] == text:
+                    return
+                self._remove_locked(word_id)
+            self._words[word_id] = text
+            if len(text) < GRAM_SIZE:
+                self._short_words.add(word_id)
+            for gram in _grams(text):
+                self._postings[gram].add(word_id)
+
+    def remove(self, word_id: int):
+        with self._lock:
+            self._remove_locked(word_id)
+
+    def _remove_locked(self, word_id: int):
+        text = self._words.pop(word_id, None)
+        if text is None:
+            return
+        self._short_words.discard(word_id)
+        for gram in _grams(text):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(word_id)
+                if not posting:
+                    del self._postings[gram]
+
+    def _candidates(self, keyword: str) -> Set[int]:
+        if len(keyword) >= GRAM_SIZE:
+            postings = []
+            for gram in _grams(keyword):
+                posting = self._postings.get(gram)
+                if not posting:
+                    return set()
+                postings.append(posting)
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates &= posting
+                if not candidates:
+                    break
+            return candidates
+        candidates = set(self._short_words)
+        for gram, posting in self._postings.items():
+            if keyword in gram:
+                candidates |= posting
+        return candidates
+
+    def search(self, keyword: str, skip: int = 0, limit: int = 20) -> Tuple[int, List[int]]:
+        """
+        Trả về (tổng số kết quả, word_id của trang hiện tại).
+
+        Xếp hạng: trùng khớp > tiền tố > chuỗi con, sau đó từ ngắn hơn, rồi theo alphabet.
+        """
+        keyword = normalize(keyword)
+        if not keyword:
+            return 0, []
+        with self._lock:
+            ranked = []
+            for word_id in self._candidates(keyword):
+                text = self._words[word_id]
+                if text == keyword:
+                    rank = 0
+                elif text.startswith(keyword):
+                    rank = 1
+                elif keyword in text:
+                    rank = 2
+                else:
+                    continue
+                ranked.append((rank, len(text), text, word_id))
+        page = heapq.nsmallest(skip + limit, ranked)[skip:]
+        return len(ranked), [word_id for _, _, _, word_id in page]
+
+
+search_index = TrigramIndex()
@@ -0,0 +1,60 @@
+import json
+import zlib
+from typing import Iterator
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .. import models
+
+# Số dòng đọc từ server-side cursor mỗi lần
+SNAPSHOT_BATCH_SIZE = 1000
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Client có nhận gzip không (theo Accept-Encoding, bỏ qua mục có q=0)"""
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            q = params.strip()
+            return not (q.startswith("q=") and float(q[2:] or 0) == 0)
+    return False
+
+
+def iter_snapshot(db: Session, version: int, compress: bool = True) -> Iterator[bytes]:
+    """
+    Sinh snapshot toàn bộ bảng Vocabulary dưới dạng NDJSON, từng khối một
+    (nén gzip nếu `compress`), rồi đóng `db`.
+
+    Dòng đầu là {"catalog_version": version}, mỗi dòng sau là một từ. Route đọc
+    `version` bằng chính session `db` trước khi stream nên phiên bản (cả ở
+    header) và các dòng thuộc cùng một transaction; client dùng phiên bản này
+    cho /vocabulary/changes?since=N. Dữ liệu đọc qua server-side cursor theo
+    lô nên bộ nhớ không phụ thuộc kích thước catalog.
+    """
+    columns = list(models.Vocabulary.__table__.columns)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # wbits=31: định dạng gzip
+
+    def encode(data: bytes) -> bytes:
+        return compressor.compress(data) if compressor else data
+
+    try:
+        chunk = encode(json.dumps({"catalog_version": version}).encode() + b"\n")
+        if chunk:
+            yield chunk
+        result = db.execute(
+            select(*columns).order_by(models.Vocabulary.word_id),
+            execution_options={"yield_per": SNAPSHOT_BATCH_SIZE},
+        )
+        for rows in result.partitions():
+            lines = "".join(
+                json.dumps(dict(row._mapping), ensure_ascii=False, separators=(",", ":"), default=str) + "\n"
+                for row in rows
+            )
+            chunk = encode(lines.encode())
+            if chunk:
+                yield chunk
+    finally:
+        db.close()
+    if compressor:
+        yield compressor.flush()
@@ -0,0 +1,51 @@
+import threading
+import time
+from typing import Dict, Iterable, Tuple
+
+# Sau mỗi chừng này lần thu hồi thì dọn các entry đã hết hạn một lần
+PRUNE_EVERY = 1024
+
+
+class RevocationList:
+    """
+    Tập JTI của refresh token đã thu hồi, giữ trong bộ nhớ để kiểm tra O(1).
+
+    Nạp lại từ bảng RevokedTokens khi khởi động; entry tự bị dọn khi token
+    tương ứng đã hết hạn (token hết hạn thì không cần nhớ nữa).
+    """
+
+    def __init__(self):
+        self._revoked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._since_prune = 0
+
+    def load(self, entries: Iterable[Tuple[str, float]]) -> None:
+        now = time.time()
+        with self._lock:
+            self._revoked = {jti: expires_at for jti, expires_at in entries if expires_at > now}
+
+    def revoke(self, jti: str, expires_at: float) -> None:
+        with self._lock:
+            self._revoked[jti] = expires_at
+            self._since_prune += 1
+            should_prune = self._since_prune >= PRUNE_EVERY
+        if should_prune:
+            self.prune()
+
+    def is_revoked(self, jti: str) -> bool:
+        return jti in self._revoked
+
+    def prune(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [jti for jti, expires_at in self._revoked.items() if expires_at <= now]
+            for jti in expired:
+                del self._revoked[jti]
+            self._since_prune = 0
+        return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+
+revocation_list = RevocationList()
@@ -0,0 +1,34 @@
+from typing import Dict, List, Sequence
+
+from sqlalchemy.orm import Session
+
+
+def upsert(db: Session, model, rows: List[Dict], key_columns: Sequence[str], update_columns: Sequence[str]):
+    """
+    Chèn nhiều dòng trong một câu lệnh; dòng trùng khóa thì cập nhật `update_columns`.
+
+    MySQL dùng INSERT ... ON DUPLICATE KEY UPDATE, SQLite/PostgreSQL dùng
+    INSERT ... ON CONFLICT DO UPDATE. Dialect khác thì merge từng dòng.
+    """
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(model).values(rows)
+        stmt = stmt.on_duplicate_key_update({column: stmt.inserted[column] for column in update_columns})
+    elif dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(model).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={column: stmt.excluded[column] for column in update_columns},
+        )
+    else:
+        for row in rows:
+            db.merge(model(**row))
+        return
+    db.execute(stmt)
@@ -0,0 +1,24 @@
+import os
+from dotenv import load_dotenv
+
+from .ttl_cache import TTLCache
+
+load_dotenv()
+
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+
+
+class UserCache(TTLCache):
+    """
+    LRU cache có TTL cho thông tin user đã xác thực, key là `sub` của token.
+
+    Chỉ lưu giá trị các cột (dict), không lưu ORM instance, để mỗi request
+    tự gắn bản sao vào session của mình.
+    """
+
+    def __init__(self, max_size: int = USER_CACHE_MAX_SIZE, ttl: float = USER_CACHE_TTL_SECONDS):
+        super().__init__(max_size, ttl)
+
+
+user_cache = UserCache()
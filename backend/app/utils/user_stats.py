@@ -0,0 +1,198 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+from dotenv import load_dotenv
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .. import models
+
+load_dotenv()
+
+logger = logging.getLogger("stulang.user_stats")
+
+LEVELS = ("a1", "a2", "b1", "b2", "c1", "c2")
+# Chu kỳ (giây) đối chiếu bộ đếm với dữ liệu thật; 0 để tắt job nền
+USER_STATS_RECONCILE_SECONDS = float(os.getenv("USER_STATS_RECONCILE_SECONDS", "3600"))
+RECONCILE_BATCH_SIZE = 1000
+
+
+def _empty() -> Dict[str, int]:
+    counters = {"learned_count": 0, "cycle_pending_count": 0}
+    counters.update({f"learned_{level}": 0 for level in LEVELS})
+    return counters
+
+
+def _as_dict(row: models.UserStats) -> Dict[str, int]:
+    return {key: getattr(row, key) for key in _empty()}
+
+
+def record(db: Session, user_id: int, learned_levels: Iterable[str] = (), cycle_pending: int = 0):
+    """
+    Cộng dồn vào bộ đếm của user trong transaction hiện tại của `db`; route tự commit.
+
+    `learned_levels` là level của từng từ vừa được học lần đầu, `cycle_pending`
+    là số từ thêm vào (dương) hoặc rời khỏi (âm) chu kỳ. Gọi sau khi đã ghi
+    thay đổi vào session: user chưa có dòng UserStats thì dòng được tính đầy đủ
+    từ dữ liệu thật (đã gồm thay đổi này) và thêm vào cùng transaction.
+    """
+    levels = Counter(learned_levels)
+    values = {}
+    learned = sum(levels.values())
+    if learned:
+        values[models.UserStats.learned_count] = models.UserStats.learned_count + learned
+    for level, count in levels.items():
+        column = getattr(models.UserStats, f"learned_{level}", None)
+        if column is not None:
+            values[column] = column + count
+    if cycle_pending:
+        values[models.UserStats.cycle_pending_count] = models.UserStats.cycle_pending_count + cycle_pending
+    if not values:
+        return
+    values[models.UserStats.updated_at] = datetime.now()
+    updated = db.query(models.UserStats).filter(models.UserStats.user_id == user_id).update(
+        values, synchronize_session=False
+    )
+    if updated:
+        return
+    # Session không autoflush: đẩy thay đổi đang chờ để compute thấy chúng
+    db.flush()
+    counters = compute(db, [user_id])[user_id]
+    try:
+        with db.begin_nested():
+            db.add(models.UserStats(user_id=user_id, updated_at=datetime.now(), **counters))
+    except IntegrityError:
+        # Request khác vừa tạo dòng này (không thấy thay đổi chưa commit của ta): cộng dồn như thường
+        db.query(models.UserStats).filter(models.UserStats.user_id == user_id).update(
+            values, synchronize_session=False
+        )
+
+
+def compute(db: Session, user_ids: List[int]) -> Dict[int, Dict[str, int]]:
+    """Tính lại bộ đếm từ UserVocabulary/CycleVocabulary bằng hai query GROUP BY"""
+    results = {user_id: _empty() for user_id in user_ids}
+    learned = db.query(
+        models.UserVocabulary.user_id, models.Vocabulary.level, func.count()
+    ).join(
+        models.Vocabulary, models.UserVocabulary.word_id == models.Vocabulary.word_id
+    ).filter(
+        models.UserVocabulary.user_id.in_(user_ids)
+    ).group_by(models.UserVocabulary.user_id, models.Vocabulary.level)
+    for user_id, level, count in learned:
+        results[user_id]["learned_count"] += count
+        if level in LEVELS:
+            results[user_id][f"learned_{level}"] += count
+    pending = db.query(models.CycleVocabulary.user_id, func.count()).filter(
+        models.CycleVocabulary.user_id.in_(user_ids)
+    ).group_by(models.CycleVocabulary.user_id)
+    for user_id, count in pending:
+        results[user_id]["cycle_pending_count"] = count
+    return results
+
+
+def get(db: Session, user_id: int) -> Dict[str, int]:
+    """
+    Bộ đếm của user; chưa có dòng thì tính từ dữ liệu thật.
+
+    Chỉ đọc (dùng được với session replica): dòng UserStats được tạo ở lần ghi
+    đầu tiên trong `record`.
+    """
+    row = db.get(models.UserStats, user_id)
+    if row is not None:
+        return _as_dict(row)
+    return compute(db, [user_id])[user_id]
+
+
+def learned_by_level(counters: Dict[str, int]) -> Dict[str, int]:
+    return {level: counters[f"learned_{level}"] for level in LEVELS if counters[f"learned_{level}"]}
+
+
+def reconcile(db: Session) -> int:
+    """
+    Đối chiếu mọi dòng UserStats với dữ liệu thật, sửa dòng lệch; trả về số dòng đã sửa.
+
+    Lệch có thể do xóa dây chuyền (admin xóa từ/user), admin đổi level của từ,
+    hoặc tranh chấp khi dòng được tạo lần đầu.
+    """
+    repaired = 0
+    last_user_id = 0
+    while True:
+        # Khóa các dòng trước khi đếm: record() đồng thời phải chờ, không bị ghi đè mất
+        rows = db.query(models.UserStats).filter(
+            models.UserStats.user_id > last_user_id
+        ).order_by(models.UserStats.user_id).limit(RECONCILE_BATCH_SIZE).with_for_update().all()
+        if not rows:
+            break
+        actual = compute(db, [row.user_id for row in rows])
+        for row in rows:
+            expected = actual[row.user_id]
+            if _as_dict(row) != expected:
+                for key, value in expected.items():
+                    setattr(row, key, value)
+                row.updated_at = datetime.now()
+                repaired += 1
+        db.commit()
+        last_user_id = rows[-1].user_id
+    return repaired
+
+
+class StatsReconciler:
+    """Thread nền chạy `reconcile` định kỳ"""
+
+    def __init__(self, interval: float = USER_STATS_RECONCILE_SECONDS):
+        self.interval = interval
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._session_factory: Optional[Callable[[], Session]] = None
+        self.runs = 0
+        self.repaired = 0
+        self.last_run_ms = 0.0
+
+    def start(self, session_factory: Callable[[], Session]):
+        if self.interval <= 0:
+            return
+        self._session_factory = session_factory
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="user-stats-reconciler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+
+    def run_once(self, db: Session) -> int:
+        start = time.perf_counter()
+        repaired = reconcile(db)
+        self.runs += 1
+        self.repaired += repaired
+        self.last_run_ms = (time.perf_counter() - start) * 1000
+        if repaired:
+            logger.warning("Repaired %d drifted UserStats rows", repaired)
+        return repaired
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                with self._session_factory() as db:
+                    self.run_once(db)
+            except Exception:
+                logger.exception("UserStats reconciliation failed")
+
+    def stats(self) -> Dict:
+        return {
+            "interval_seconds": self.interval,
+            "runs": self.runs,
+            "repaired": self.repaired,
+            "last_run_ms": round(self.last_run_ms, 2),
+            "running": self._thread is not None and self._thread.is_alive(),
+        }
+
+
+stats_reconciler = StatsReconciler()
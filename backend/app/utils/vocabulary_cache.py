@@ -0,0 +1,52 @@
+import os
+from typing import Dict, Iterable
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+
+from .. import models
+from .ttl_cache import TTLCache
+
+load_dotenv()
+
+VOCAB_CACHE_MAX_SIZE = int(os.getenv("VOCAB_CACHE_MAX_SIZE", "50000"))
+# Chỉ là lưới an toàn: các route admin (và đồng bộ catalog giữa worker) tự invalidate khi sửa
+VOCAB_CACHE_TTL_SECONDS = float(os.getenv("VOCAB_CACHE_TTL_SECONDS", "600"))
+
+
+class VocabularyCache(TTLCache):
+    """
+    Cache read-through cho các dòng Vocabulary, key là word_id.
+
+    Giá trị là dict các cột.
+    Mỗi lần invalidate tăng `generation`; dòng đọc từ DB chỉ được lưu nếu không
+    có invalidate nào xen vào trong lúc query, tránh ghi đè bằng dữ liệu cũ.
+    """
+
+    generation = 0
+
+    def invalidate(self, key: int) -> None:
+        with self._lock:
+            self.generation += 1
+        super().invalidate(key)
+
+    def get_many(self, db: Session, word_ids: Iterable[int]) -> Dict[int, Dict]:
+        """Lấy nhiều từ: từ nào chưa có trong cache được nạp bằng một query IN"""
+        found, missing = {}, []
+        for word_id in dict.fromkeys(word_ids):
+            data = self.get(word_id)
+            if data is None:
+                missing.append(word_id)
+            else:
+                found[word_id] = data
+        if missing:
+            generation = self.generation
+            rows = db.query(models.Vocabulary).filter(models.Vocabulary.word_id.in_(missing)).all()
+            for row in rows:
+                data = {column.key: getattr(row, column.key) for column in models.Vocabulary.__table__.columns}
+                if self.generation == generation:
+                    self.set(row.word_id, data)
+                found[row.word_id] = data
+        return found
+
+
+vocabulary_cache = VocabularyCache(VOCAB_CACHE_MAX_SIZE, VOCAB_CACHE_TTL_SECONDS)
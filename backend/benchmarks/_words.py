@@ -0,0 +1,22 @@
+"""Sinh danh sách từ giả lập (chữ thường, độ dài giống tiếng Anh) cho các benchmark"""
+import random
+import string
+
+SYLLABLES = [a + b for a in "bcdfghjklmnprstvwz" for b in "aeiou"] + list("aeiou")
+
+
+def random_words(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < count:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 5)))
+        if rng.random() < 0.3:
+            word += rng.choice(string.ascii_lowercase)
+        words.add(word)
+    return sorted(words, key=lambda _: rng.random())
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
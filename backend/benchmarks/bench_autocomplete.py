@@ -0,0 +1,44 @@
+"""
+Độ trễ p50/p99 của autocomplete theo tiền tố trên 1 triệu từ.
+
+Chạy từ thư mục backend:
+    python -m benchmarks.bench_autocomplete [số_từ]
+"""
+import random
+import sys
+import time
+
+from app.utils.autocomplete import PrefixIndex
+from benchmarks._words import random_words, percentile
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    words = random_words(count)
+
+    start = time.perf_counter()
+    index = PrefixIndex()
+    index.load(enumerate(words, start=1))
+    print(f"built prefix index over {count} words in {time.perf_counter() - start:.2f} s")
+
+    rng = random.Random(3)
+    prefixes = [word[:rng.randint(1, min(6, len(word)))] for word in rng.sample(words, 20_000)]
+
+    samples = []
+    for prefix in prefixes:
+        begin = time.perf_counter()
+        index.complete(prefix, 10)
+        samples.append((time.perf_counter() - begin) * 1000)
+    print(
+        f"complete(top 10): p50 {percentile(samples, 50):.4f} ms  "
+        f"p99 {percentile(samples, 99):.4f} ms  max {max(samples):.4f} ms"
+    )
+
+    begin = time.perf_counter()
+    for word_id in range(count + 1, count + 101):
+        index.add(word_id, f"zz{word_id}")
+    print(f"incremental add: {(time.perf_counter() - begin) * 10:.3f} ms per word")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Sinh đáp án sai cho /cycles/practice-set: lọc toàn bộ danh sách định nghĩa cho
+từng từ rồi random.sample (cách cũ, chưa tính thời gian nạp cả bảng từ DB) so
+với rút ngẫu nhiên có loại lại trên DistractorPool, từ toàn catalog và từ
+bucket cùng level/từ loại/topic.
+
+Chạy từ thư mục backend:
+    python -m benchmarks.bench_distractors [số_từ] [số_từ_trong_chu_kỳ]
+"""
+import random
+import sys
+import time
+import tracemalloc
+
+from app.utils.distractors import DistractorPool
+from benchmarks._words import random_words, percentile
+
+
+def naive_practice_set(definitions, cycle):
+    for correct_definition, _ in cycle:
+        wrong_definitions = [d for d in definitions if d != correct_definition]
+        random.sample(wrong_definitions, 3)
+
+
+def pooled_practice_set(pool, cycle):
+    for correct_definition, _ in cycle:
+        pool.sample(correct_definition, 3)
+
+
+def bucketed_practice_set(pool, cycle):
+    for correct_definition, (level, part_of_speech, topic) in cycle:
+        pool.sample(correct_definition, 3, level, part_of_speech, topic)
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - begin) * 1000)
+    return samples
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    cycle_size = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    definitions = [f"definition of {word}" for word in random_words(count)]
+    levels = ["a1", "a2", "b1", "b2", "c1", "c2"]
+    parts_of_speech = ["noun", "verb", "adjective", "adverb"]
+    attributes = [(levels[i % 6], parts_of_speech[i % 4], f"topic{i % 40}") for i in range(count)]
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    pool = DistractorPool()
+    pool.load(
+        (word_id, definition, *attributes[word_id - 1])
+        for word_id, definition in enumerate(definitions, start=1)
+    )
+    elapsed = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+    tracemalloc.stop()
+    print(f"loaded distractor pool with {count} definitions in {elapsed * 1000:.1f} ms, ~{memory:.1f} MiB")
+
+    rng = random.Random(7)
+    cycle = rng.sample(list(zip(definitions, attributes)), cycle_size)
+    results = {
+        "filter + sample": timed(lambda: naive_practice_set(definitions, cycle), 10),
+        "pool sampling": timed(lambda: pooled_practice_set(pool, cycle), 1_000),
+        "bucketed": timed(lambda: bucketed_practice_set(pool, cycle), 1_000),
+    }
+    for name, samples in results.items():
+        print(
+            f"{name:>16}: p50 {percentile(samples, 50):9.3f} ms  "
+            f"p99 {percentile(samples, 99):9.3f} ms  per practice set of {cycle_size} words"
+        )
+
+    begin = time.perf_counter()
+    for word_id in range(1, 1_001):
+        pool.remove(word_id)
+        pool.add(word_id, definitions[word_id - 1], *attributes[word_id - 1])
+    print(f"incremental remove + add: {(time.perf_counter() - begin) * 1000 / 1_000:.4f} ms per word")
+
+
+if __name__ == "__main__":
+    main()
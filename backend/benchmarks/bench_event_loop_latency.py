@@ -0,0 +1,81 @@
+"""
+Đo độ trễ event loop khi route async chạy query bằng Session đồng bộ
+so với AsyncSession.
+
+Một task "nhịp tim" ngủ 1 ms liên tục và ghi lại độ trễ thực tế, trong khi
+nhiều coroutine cùng chạy một query tốn vài chục ms trên SQLite.
+
+Chạy từ thư mục backend:
+    python -m benchmarks.bench_event_loop_latency
+"""
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+CONCURRENCY = 20
+# Query CPU-bound cố ý chậm để thấy rõ chênh lệch
+SLOW_QUERY = text(
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 300000) "
+    "SELECT count(*) FROM c"
+)
+
+
+async def _heartbeat(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append((time.perf_counter() - start - 0.001) * 1000)
+
+
+async def _run(handler) -> dict:
+    stop = asyncio.Event()
+    lags = []
+    beat = asyncio.create_task(_heartbeat(stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*(handler() for _ in range(CONCURRENCY)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    lags.sort()
+    return {
+        "elapsed_ms": elapsed * 1000,
+        "lag_p50_ms": statistics.median(lags) if lags else 0.0,
+        "lag_max_ms": lags[-1] if lags else 0.0,
+        "beats": len(lags),
+    }
+
+
+async def main():
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    sync_engine = create_engine(f"sqlite:///{path}")
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+
+    async def sync_handler():
+        # Giống route async dùng Session đồng bộ: query chạy ngay trên event loop
+        with sync_engine.connect() as conn:
+            conn.execute(SLOW_QUERY).scalar()
+        await asyncio.sleep(0)
+
+    async def async_handler():
+        async with async_engine.connect() as conn:
+            (await conn.execute(SLOW_QUERY)).scalar()
+
+    for name, handler in (("sync Session ", sync_handler), ("AsyncSession ", async_handler)):
+        result = await _run(handler)
+        print(
+            f"{name}: total {result['elapsed_ms']:8.1f} ms  "
+            f"loop lag p50 {result['lag_p50_ms']:7.2f} ms  max {result['lag_max_ms']:7.2f} ms  "
+            f"heartbeats {result['beats']}"
+        )
+
+    await async_engine.dispose()
+    sync_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+"""
+Tra từ gần đúng (edit distance <= 2): index deletion kiểu SymSpell so với duyệt
+tuần tự toàn bộ catalog và tính Levenshtein cho từng từ.
+
+Chạy từ thư mục backend:
+    python -m benchmarks.bench_fuzzy_lookup [số_từ]
+"""
+import random
+import sys
+import time
+import tracemalloc
+
+from app.utils.fuzzy_index import FuzzyIndex, MAX_EDIT_DISTANCE, edit_distance
+from benchmarks._words import random_words, percentile
+
+ALPHABET = "abcdefghijklmnopqrstuvwxyz"
+
+
+def misspell(word: str, rng: random.Random) -> str:
+    """Một lỗi gõ ngẫu nhiên: thay, xóa, chèn hoặc đảo hai ký tự liền kề"""
+    i = rng.randrange(len(word))
+    kind = rng.randrange(4)
+    if kind == 0:
+        return word[:i] + rng.choice(ALPHABET) + word[i + 1:]
+    if kind == 1 and len(word) > 1:
+        return word[:i] + word[i + 1:]
+    if kind == 2:
+        return word[:i] + rng.choice(ALPHABET) + word[i:]
+    if i + 1 < len(word):
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word + rng.choice(ALPHABET)
+
+
+def naive_lookup(words, keyword: str, max_distance: int):
+    matches = []
+    for word_id, word in enumerate(words, start=1):
+        distance = edit_distance(keyword, word, max_distance)
+        if distance <= max_distance:
+            matches.append((distance, word, word_id))
+    matches.sort()
+    return [(word_id, distance) for distance, _, word_id in matches]
+
+
+def timed(func, queries):
+    samples = []
+    for query in queries:
+        begin = time.perf_counter()
+        func(query)
+        samples.append((time.perf_counter() - begin) * 1000)
+    return samples
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+    words = random_words(count)
+
+    start = time.perf_counter()
+    index = FuzzyIndex()
+    index.load(enumerate(words, start=1))
+    elapsed = time.perf_counter() - start
+
+    # tracemalloc làm chậm việc xây index nên đo bộ nhớ ở một lần xây riêng
+    tracemalloc.start()
+    traced = FuzzyIndex()
+    traced.load(enumerate(words, start=1))
+    memory = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+    tracemalloc.stop()
+    del traced
+    print(f"built fuzzy index over {count} words in {elapsed:.2f} s, ~{memory:.0f} MiB")
+
+    rng = random.Random(5)
+    queries = [misspell(word, rng) for word in rng.sample(words, 2_000)]
+
+    indexed = timed(lambda q: index.lookup(q, MAX_EDIT_DISTANCE), queries)
+    # Duyệt tuần tự mất vài giây mỗi truy vấn nên chỉ đo trên một mẫu nhỏ
+    expected = {}
+    naive = timed(lambda q: expected.setdefault(q, naive_lookup(words, q, MAX_EDIT_DISTANCE)), queries[:10])
+    for name, samples in (("symspell index", indexed), ("naive scan", naive)):
+        print(
+            f"{name:>15}: p50 {percentile(samples, 50):9.3f} ms  "
+            f"p99 {percentile(samples, 99):9.3f} ms  ({len(samples)} queries)"
+        )
+
+    for query, matches in expected.items():
+        assert index.lookup(query) == matches, query
+    print("results match the naive scan on the sampled queries")
+
+    begin = time.perf_counter()
+    for word_id in range(count + 1, count + 101):
+        index.add(word_id, f"zz{word_id}")
+    print(f"incremental add: {(time.perf_counter() - begin) * 10:.3f} ms per word")
+
+
+if __name__ == "__main__":
+    main()
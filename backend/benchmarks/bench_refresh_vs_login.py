@@ -0,0 +1,50 @@
+"""
+So sánh chi phí CPU của luồng đăng nhập (bcrypt verify) với luồng refresh token.
+
+Chạy từ thư mục backend:
+    python -m benchmarks.bench_refresh_vs_login
+"""
+import statistics
+import time
+
+from app import authentication, models
+from app.utils.user_cache import user_cache
+
+
+def _timeit(func, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def main():
+    password_hash = authentication.get_password_hash("correct horse battery staple")
+    user = models.User(user_id=1, username="bench", email="bench@example.com",
+                       password=password_hash, role="user", token_version=0)
+    user_cache.set(user.username, authentication._snapshot_user(user))
+
+    def login_path():
+        authentication.verify_password("correct horse battery staple", password_hash)
+        authentication.create_token_pair(user)
+
+    refresh_token = authentication.create_refresh_token(user)
+
+    def refresh_path():
+        # Giống refresh_tokens() nhưng bỏ phần ghi RevokedTokens xuống DB
+        payload = authentication._decode_refresh_token(refresh_token)
+        authentication.revocation_list.is_revoked(payload["jti"])
+        user_cache.get(payload["sub"])
+        authentication.create_token_pair(user)
+
+    login_median, login_max = _timeit(login_path, 20)
+    refresh_median, refresh_max = _timeit(refresh_path, 2000)
+    print(f"login   : median {login_median:8.3f} ms  max {login_max:8.3f} ms")
+    print(f"refresh : median {refresh_median:8.3f} ms  max {refresh_max:8.3f} ms")
+    print(f"refresh is ~{login_median / refresh_median:.0f}x cheaper than login")
+
+
+if __name__ == "__main__":
+    main()
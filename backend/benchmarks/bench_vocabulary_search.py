@@ -0,0 +1,56 @@
+"""
+So sánh tìm kiếm từ vựng bằng index trigram với quét tuần tự (tương đương
+`word ILIKE '%kw%'` không có index) trên 100k từ.
+
+Chạy từ thư mục backend:
+    python -m benchmarks.bench_vocabulary_search [số_từ]
+"""
+import random
+import sys
+import time
+
+from app.utils.search_index import TrigramIndex
+from benchmarks._words import random_words, percentile
+
+
+def naive_search(words, keyword, skip, limit):
+    keyword = keyword.lower()
+    ranked = []
+    for word_id, word in words:
+        text = word.lower()
+        if keyword in text:
+            rank = 0 if text == keyword else 1 if text.startswith(keyword) else 2
+            ranked.append((rank, len(text), text, word_id))
+    ranked.sort()
+    return len(ranked), [word_id for *_, word_id in ranked[skip:skip + limit]]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    words = list(enumerate(random_words(count), start=1))
+
+    start = time.perf_counter()
+    index = TrigramIndex()
+    index.load(words)
+    print(f"built index over {count} words in {time.perf_counter() - start:.2f} s")
+
+    rng = random.Random(7)
+    keywords = []
+    for _, word in rng.sample(words, 300):
+        start_at = rng.randint(0, max(0, len(word) - 3))
+        keywords.append(word[start_at:start_at + rng.choice([1, 2, 3, 4, 6])])
+
+    for name, search in (("trigram", index.search), ("naive  ", lambda k, s, l: naive_search(words, k, s, l))):
+        samples = []
+        for keyword in keywords:
+            begin = time.perf_counter()
+            search(keyword, 0, 20)
+            samples.append((time.perf_counter() - begin) * 1000)
+        print(f"{name}: p50 {percentile(samples, 50):7.3f} ms  p99 {percentile(samples, 99):7.3f} ms")
+
+    for keyword in ("ba", "bako", "zu"):
+        assert index.search(keyword, 0, 20) == naive_search(words, keyword, 0, 20), keyword
+
+
+if __name__ == "__main__":
+    main()
@@ -70,10 +70,12 @@ export default function ProfileForm() {
     try {
       setError(null)
       setSuccess(null)
-      await api.put('/users/me/password', {
+      const response = await api.put('/users/me/password', {
         current_password: currentPassword,
         new_password: newPassword
       })
+      // Đổi mật khẩu thu hồi token cũ, lưu token mới để không bị đăng xuất
+      localStorage.setItem('token', response.data.access_token)
       setSuccess("Mật khẩu đã được cập nhật thành công")
       setCurrentPassword("")
       setNewPassword("")
@@ -13,6 +13,11 @@ api.interceptors.request.use((config) => {
   if (token) {
     config.headers.Authorization = `Bearer ${token}`;
   }
+  // Gửi lại mốc ghi gần nhất để server đọc từ primary (read-your-writes)
+  const writeMarker = sessionStorage.getItem('readYourWrites');
+  if (writeMarker) {
+    config.headers['X-Read-Your-Writes'] = writeMarker;
+  }
   return config;
 }, (error) => {
   return Promise.reject(error);
@@ -20,7 +25,13 @@ api.interceptors.request.use((config) => {
 
 // Thêm interceptor để xử lý response
 api.interceptors.response.use(
-  (response) => response,
+  (response) => {
+    const writeMarker = response.headers['x-read-your-writes'];
+    if (writeMarker) {
+      sessionStorage.setItem('readYourWrites', writeMarker);
+    }
+    return response;
+  },
   (error) => {
     if (error.response?.status === 401) {
       // Xóa token nếu hết hạn
@@ -12,6 +12,9 @@ export default function TestPage() {
   const [error, setError] = useState(null)
   const [showResults, setShowResults] = useState(false)
   const [score, setScore] = useState(0)
+  const [sessionToken, setSessionToken] = useState(null)
+  // Kết quả chấm của server theo word_id (gồm correct_answer)
+  const [grades, setGrades] = useState({})
   const navigate = useNavigate()
 
   useEffect(() => {
@@ -21,8 +24,20 @@ export default function TestPage() {
   const fetchQuestions = async () => {
     try {
       setLoading(true)
-      const response = await api.get('/cycles/practice-set')
-      setQuestions(response.data)
+      // Bắt đầu phiên làm bài: server giữ đáp án trong session_token và tự chấm
+      const session = await api.post('/cycles/practice-sessions')
+      const token = session.data.session_token
+      let items = []
+      let skip = 0
+      while (skip != null) {
+        const page = await api.get('/cycles/practice-sessions/questions', {
+          params: { session_token: token, skip, limit: 100 }
+        })
+        items = items.concat(page.data.items)
+        skip = page.data.next_skip
+      }
+      setSessionToken(token)
+      setQuestions(items)
     } catch (err) {
       if (err.response?.status === 404) {
         setError("Không tìm thấy chu kỳ học nào đang hoạt động hoặc không có từ vựng nào trong chu kỳ")
@@ -67,40 +82,26 @@ export default function TestPage() {
         return
       }
 
-      // Chuẩn bị dữ liệu với validation
-      const quizResults = {
-        quiz_results: questions.map((question, index) => {
-          const selectedAnswer = selectedAnswers[index]
-          
-          return {
-            word_id: parseInt(question.word_id),
-            selected_answer: parseInt(selectedAnswer),
-            is_correct: selectedAnswer === question.correct_answer
-          }
-        })
-      }
-
-      console.log('Submitting results:', quizResults)
-
-      // Validate dữ liệu trước khi gửi
-      const isValidData = quizResults.quiz_results.every(result => 
-        typeof result.word_id === 'number' &&
-        typeof result.selected_answer === 'number' &&
-        typeof result.is_correct === 'boolean'
-      )
-      
-      if (!isValidData) {
-        setError("Dữ liệu không hợp lệ")
-        return
+      const submission = {
+        session_token: sessionToken,
+        answers: questions.map((question, index) => ({
+          word_id: question.word_id,
+          selected_answer: selectedAnswers[index]
+        }))
       }
 
-      // Gửi kết quả lên server (từ đúng sẽ tự động bị xóa khỏi cycle)
-      const response = await api.post('/cycles/practice-results', quizResults)
+      // Gửi bài lên server chấm (từ đúng sẽ tự động bị xóa khỏi cycle)
+      const response = await api.post('/cycles/practice-sessions/submit', submission)
       console.log('Server response:', response.data)
 
+      const gradesByWord = {}
+      response.data.results.forEach(result => {
+        gradesByWord[result.word_id] = result
+      })
+      setGrades(gradesByWord)
+
       // Tính điểm
-      const correctAnswers = quizResults.quiz_results.filter(result => result.is_correct).length
-      setScore((correctAnswers / questions.length) * 100)
+      setScore((response.data.correct_count / questions.length) * 100)
       setShowResults(true)
       
     } catch (err) {
@@ -130,6 +131,8 @@ export default function TestPage() {
     setSelectedAnswers({})
     setShowResults(false)
     setScore(0)
+    setSessionToken(null)
+    setGrades({})
     setError(null)
     fetchQuestions()
   }
@@ -168,10 +171,11 @@ export default function TestPage() {
   }
 
   const currentQuestion = questions[currentIndex]
+  const correctAnswerOf = (question) => grades[question.word_id]?.correct_answer
 
   if (showResults) {
     const correctCount = questions.filter((_, index) => 
-      selectedAnswers[index] === questions[index].correct_answer
+      selectedAnswers[index] === correctAnswerOf(questions[index])
     ).length
 
     return (
@@ -206,14 +210,14 @@ export default function TestPage() {
             <div className="space-y-6">
               {questions.map((question, index) => (
                 <div key={index} className={`p-4 rounded-lg ${
-                  selectedAnswers[index] === question.correct_answer
+                  selectedAnswers[index] === correctAnswerOf(question)
                     ? 'bg-green-50 border border-green-200'
                     : 'bg-red-50 border border-red-200'
                 }`}>
                   <div className="flex items-center justify-between mb-2">
                     <div className="font-medium">{question.word}</div>
                     <div className="flex items-center space-x-2">
-                      {selectedAnswers[index] === question.correct_answer ? (
+                      {selectedAnswers[index] === correctAnswerOf(question) ? (
                         <>
                           <Check className="text-green-500 w-5 h-5" />
                           <span className="text-xs text-green-600 font-medium">Đã học</span>
@@ -227,9 +231,9 @@ export default function TestPage() {
                     </div>
                   </div>
                   <div className="text-sm text-gray-600">
-                    <strong>Đáp án đúng:</strong> {question.choices[question.correct_answer]}
+                    <strong>Đáp án đúng:</strong> {question.choices[correctAnswerOf(question)]}
                   </div>
-                  {selectedAnswers[index] !== question.correct_answer && (
+                  {selectedAnswers[index] !== correctAnswerOf(question) && (
                     <div className="text-sm text-red-600">
                       <strong>Đáp án của bạn:</strong> {question.choices[selectedAnswers[index]]}
                     </div>
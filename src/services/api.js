@@ -19,6 +19,11 @@ api.interceptors.request.use(
     if (token) {
       config.headers['Authorization'] = `Bearer ${token}`;
     }
+    // Gửi lại mốc ghi gần nhất để server đọc từ primary (read-your-writes)
+    const writeMarker = sessionStorage.getItem('readYourWrites');
+    if (writeMarker) {
+      config.headers['X-Read-Your-Writes'] = writeMarker;
+    }
     return config;
   },
   (error) => {
@@ -28,7 +33,13 @@ api.interceptors.request.use(
 
 // Xử lý token hết hạn
 api.interceptors.response.use(
-  (response) => response,
+  (response) => {
+    const writeMarker = response.headers['x-read-your-writes'];
+    if (writeMarker) {
+      sessionStorage.setItem('readYourWrites', writeMarker);
+    }
+    return response;
+  },
   (error) => {
     if (error.response && error.response.status === 401) {
       // Token hết hạn hoặc không hợp lệ